@@ -1 +1,405 @@
 """A component for Environment Canada weather."""
+import asyncio
+import datetime
+from http import HTTPStatus
+import logging
+import random
+from types import MappingProxyType
+
+from aiohttp import ClientError
+import async_timeout
+from env_canada import ECWeather  # pylint: disable=import-error
+
+from homeassistant.core import callback
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
+import homeassistant.util.dt as dt
+
+from .alerts import ECAlertsUpdateCoordinator
+from .breaker import get_breaker
+from .const import DOMAIN
+from .history import async_get_history, async_setup_history
+from .schedule import PublishSchedule
+from .session import async_get_session
+from .storage import async_get_cache
+from .timing import Timings
+
+_LOGGER = logging.getLogger(__name__)
+
+DATA_WEATHER = "weather"
+
+PLATFORMS = ["camera", "sensor", "weather"]
+
+CITYPAGE_HOST = "dd.weather.gc.ca"
+CITYPAGE_URL = "https://dd.weather.gc.ca/citypage_weather/xml/{}_{}.xml"
+
+UPDATE_INTERVAL = datetime.timedelta(minutes=5)
+UPDATE_TIMEOUT = 10
+
+MIN_UPDATE_INTERVAL = datetime.timedelta(minutes=1)
+MAX_UPDATE_INTERVAL = datetime.timedelta(hours=1)
+CONDITIONS_CADENCE = datetime.timedelta(hours=1)
+FORECASTS_CADENCE = datetime.timedelta(hours=6)
+
+MAX_CONCURRENT_STATIONS = 5
+STATION_JITTER = 10
+
+
+async def async_setup(hass, config):
+    """Set up the parts shared by every station."""
+    async_setup_history(hass)
+    return True
+
+
+async def async_setup_entry(hass, entry):
+    """Set up every platform for a configured station."""
+    entry.async_on_unload(entry.add_update_listener(async_reload_entry))
+    hass.config_entries.async_setup_platforms(entry, PLATFORMS)
+    return True
+
+
+async def async_reload_entry(hass, entry):
+    """Reload a configured station when its options change."""
+    await hass.config_entries.async_reload(entry.entry_id)
+
+
+async def async_unload_entry(hass, entry):
+    """Unload a configured station."""
+    return await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
+
+
+def get_weather_data(hass, station_id, coordinates, language="english"):
+    """Return the shared weather coordinator for a station and language."""
+    key = (station_id or tuple(coordinates), language)
+    hubs = hass.data.setdefault(DOMAIN, {}).setdefault(DATA_WEATHER, {})
+
+    if key not in hubs:
+        if station_id:
+            ec_data = ECWeather(station_id=station_id, language=language)
+        else:
+            ec_data = ECWeather(coordinates=tuple(coordinates), language=language)
+        hubs[key] = ECWeatherUpdateCoordinator(hass, ec_data, key)
+
+    return hubs[key]
+
+
+def build_snapshot(ec_data, alerts=None):
+    """Return a read-only mapping of every condition and alert value.
+
+    The snapshot is built fresh for each refresh and never mutated, so
+    entities can read it at any time without copying. Alerts from the
+    fast alert refresh, if given because they are newer, take the place
+    of the parsed ones.
+    """
+    fields = dict(ec_data.conditions)
+    fields.update(ec_data.alerts)
+    snapshot = {key: freeze(field.get("value")) for key, field in fields.items()}
+    snapshot.update(alerts or {})
+    return MappingProxyType(snapshot)
+
+
+def freeze(value):
+    """Return a read-only copy of a parsed value."""
+    if isinstance(value, list):
+        return tuple(freeze(item) for item in value)
+    if isinstance(value, dict):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    return value
+
+
+class ECWeatherUpdateCoordinator(DataUpdateCoordinator):
+    """Weather data for one station, shared by every platform that uses it."""
+
+    def __init__(self, hass, ec_data, key):
+        """Initialize the shared weather data."""
+        super().__init__(
+            hass,
+            _LOGGER,
+            name=f"environment_canada {key[0]} {key[1]}",
+            update_interval=UPDATE_INTERVAL,
+        )
+        self.ec_data = ec_data
+        self.revisions = {}
+        self.next_update = None
+        self.schedules = {
+            "conditions": PublishSchedule(
+                CONDITIONS_CADENCE, MIN_UPDATE_INTERVAL, MAX_UPDATE_INTERVAL
+            ),
+            "forecasts": PublishSchedule(
+                FORECASTS_CADENCE, MIN_UPDATE_INTERVAL, MAX_UPDATE_INTERVAL
+            ),
+        }
+        self.alerts = ECAlertsUpdateCoordinator(hass, self)
+        self.timings = Timings()
+        self.stale = False
+        self._cache = None
+        self._fetch = None
+        self._validators = {}
+        self._timestamp = None
+
+    @property
+    def citypage_url(self):
+        """Return the URL of the station's citypage XML, once it is known."""
+        station_id = getattr(self.ec_data, "station_id", None)
+        if station_id is None:
+            return None
+        return CITYPAGE_URL.format(station_id, self.ec_data.language[0])
+
+    async def async_first_refresh(self):
+        """Load initial data from the cache, or fetch it if there is none.
+
+        Restored data is refreshed in the background, so startup does not
+        wait on Environment Canada.
+        """
+        if self._cache is None and await self.async_restore():
+            self.hass.async_create_task(self.async_refresh())
+        if self.data is None:
+            await self.async_refresh()
+
+    async def async_restore(self):
+        """Restore the last data saved for this station."""
+        self._cache = await async_get_cache(self.hass)
+        cached = self._cache.get(self.name)
+        if self.data is not None or not cached:
+            return False
+
+        if getattr(self.ec_data, "station_id", None) is None:
+            self.ec_data.station_id = cached["station_id"]
+        metadata = dict(cached["metadata"])
+        if metadata.get("timestamp"):
+            metadata["timestamp"] = dt.parse_datetime(metadata["timestamp"])
+        self.ec_data.metadata.update(metadata)
+        self.ec_data.conditions = dict(cached["conditions"])
+        self.ec_data.alerts = dict(cached["alerts"])
+        self.ec_data.daily_forecasts = list(cached["daily_forecasts"])
+        self.ec_data.hourly_forecasts = list(cached["hourly_forecasts"])
+        self.ec_data.forecast_time = cached["forecast_time"]
+        self._validators = dict(cached["validators"])
+
+        snapshot = build_snapshot(self.ec_data)
+        self._track_changes(snapshot)
+        self.data = snapshot
+        return True
+
+    def _save(self):
+        """Save a copy of the current data to the cache.
+
+        The cache is written later, in the executor, so it must not share
+        the containers that the next ECWeather.update fills in. The update
+        replaces the fields inside them rather than changing those fields,
+        so copying the containers is enough.
+        """
+        if self._cache is None:
+            return
+        self._cache.set(
+            self.name,
+            {
+                "station_id": getattr(self.ec_data, "station_id", None),
+                "metadata": dict(self.ec_data.metadata),
+                "conditions": dict(self.ec_data.conditions),
+                "alerts": dict(self.ec_data.alerts),
+                "daily_forecasts": list(self.ec_data.daily_forecasts),
+                "hourly_forecasts": list(self.ec_data.hourly_forecasts),
+                "forecast_time": getattr(self.ec_data, "forecast_time", None),
+                "validators": dict(self._validators),
+            },
+        )
+
+    async def _async_update_data(self):
+        """Fetch data from Environment Canada, joining a fetch in progress."""
+        if self._fetch is None:
+            self._fetch = self.hass.async_create_task(self._async_fetch())
+            self._fetch.add_done_callback(self._fetch_done)
+        return await asyncio.shield(self._fetch)
+
+    @callback
+    def _fetch_done(self, fetch):
+        """Forget a finished fetch, even if every caller stopped waiting."""
+        if self._fetch is fetch:
+            self._fetch = None
+
+    async def _async_fetch(self):
+        """Download and parse the station's citypage XML.
+
+        While the host is failing, the last good data is kept and marked
+        stale, so entities stay available.
+        """
+        breaker = get_breaker(self.hass, CITYPAGE_HOST)
+        if not breaker.allow():
+            return self._keep_stale_data(
+                breaker, f"{CITYPAGE_HOST} is not responding"
+            )
+        try:
+            async with async_timeout.timeout(UPDATE_TIMEOUT):
+                with self.timings.span("check"):
+                    validators = await self._async_check_citypage()
+                self.timings.hit("citypage", validators is None)
+                if validators is None:
+                    _LOGGER.debug("%s not modified, keeping current data", self.name)
+                    breaker.success()
+                    self.stale = False
+                    self._plan_next_update()
+                    return self.data
+                # Download and XML parsing both happen inside ECWeather.update
+                fetched = dt.utcnow()
+                with self.timings.span("update"):
+                    await self.ec_data.update()
+        except (asyncio.TimeoutError, ClientError) as err:
+            breaker.failure()
+            return self._keep_stale_data(
+                breaker, f"Error fetching {self.name}: {err}", err
+            )
+        breaker.success()
+        self.stale = False
+        self._validators = validators
+        # Alerts read by the fast refresh during this fetch are newer
+        alerts = None
+        if self.alerts.updated is not None and self.alerts.updated > fetched:
+            alerts = self.alerts.data
+        with self.timings.span("snapshot"):
+            snapshot = build_snapshot(self.ec_data, alerts)
+            self._track_changes(snapshot)
+        self._plan_next_update()
+        self._save()
+        await self._async_record_history(snapshot)
+        return snapshot
+
+    def _keep_stale_data(self, breaker, message, err=None):
+        """Return the last good data after a failed or skipped fetch.
+
+        The next attempt is planned for as soon as the host's breaker
+        allows one, rather than after the usual publish-based wait.
+        """
+        retry = datetime.timedelta(seconds=breaker.retry_in())
+        self.update_interval = max(MIN_UPDATE_INTERVAL, retry)
+        self.next_update = dt.utcnow() + self.update_interval
+        if self.data is None:
+            raise UpdateFailed(message) from err
+        _LOGGER.debug("%s, keeping the last data", message)
+        self.stale = True
+        return self.data
+
+    async def _async_record_history(self, snapshot):
+        """Queue the latest observation for the station's history."""
+        station_id = getattr(self.ec_data, "station_id", None)
+        observed = self.ec_data.metadata.get("timestamp")
+        if station_id is None or observed is None:
+            return
+        history = await async_get_history(self.hass)
+        self.hass.async_create_task(
+            history.async_record(station_id, observed, snapshot)
+        )
+
+    def update_alerts(self, alerts):
+        """Merge alerts from the fast alert refresh into the current data."""
+        if self.data is None:
+            return
+        snapshot = MappingProxyType({**self.data, **alerts})
+        self._track_changes(snapshot)
+        self.data = snapshot
+
+    def _plan_next_update(self):
+        """Schedule the next fetch just after the next expected publish.
+
+        Alerts are kept fresh by their own refresh, so they do not limit
+        how long the full citypage fetch can wait.
+        """
+        now = dt.utcnow()
+        self.schedules["conditions"].record(self.ec_data.metadata.get("timestamp"), now)
+        self.schedules["forecasts"].record(
+            getattr(self.ec_data, "forecast_time", None), now
+        )
+        interval = min(
+            schedule.next_interval(now) for schedule in self.schedules.values()
+        )
+        self.update_interval = interval
+        self.next_update = now + self.update_interval
+
+    def _track_changes(self, snapshot):
+        """Bump the revision of each field whose value or timestamp changed."""
+        timestamp = self.ec_data.metadata.get("timestamp")
+        previous = self.data or {}
+        for key, value in snapshot.items():
+            if (
+                timestamp != self._timestamp
+                or key not in previous
+                or previous[key] != value
+            ):
+                self.revisions[key] = self.revisions.get(key, 0) + 1
+        self._timestamp = timestamp
+
+    async def _async_check_citypage(self):
+        """Return the citypage's new cache validators, or None if unchanged."""
+        url = self.citypage_url
+        if url is None:
+            return {}
+
+        headers = self._validators if self.data is not None else {}
+        session = async_get_session(self.hass)
+        async with session.head(url, headers=headers) as response:
+            if response.status == HTTPStatus.NOT_MODIFIED:
+                return None
+            response.raise_for_status()
+            if response.content_length is not None:
+                self.timings.size("citypage", response.content_length)
+            validators = {}
+            if "ETag" in response.headers:
+                validators["If-None-Match"] = response.headers["ETag"]
+            if "Last-Modified" in response.headers:
+                validators["If-Modified-Since"] = response.headers["Last-Modified"]
+            return validators
+
+
+class ECStationsUpdateCoordinator(DataUpdateCoordinator):
+    """Refresh several stations together on one schedule."""
+
+    def __init__(self, hass, stations):
+        """Initialize the batch with the stations' own coordinators."""
+        super().__init__(
+            hass,
+            _LOGGER,
+            name="environment_canada stations",
+            update_interval=UPDATE_INTERVAL,
+        )
+        self.stations = stations
+
+    async def async_first_refresh(self):
+        """Restore cached data, fetching now only if a station has none."""
+        await asyncio.gather(*(station.async_restore() for station in self.stations))
+        if all(station.data is not None for station in self.stations):
+            self.hass.async_create_task(self.async_refresh())
+        else:
+            await self.async_refresh()
+
+    async def _async_update_data(self):
+        """Refresh every station that is due, a few at a time.
+
+        Each station records its own success or failure, so one slow or
+        failing station does not hold back the others.
+        """
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_STATIONS)
+        now = dt.utcnow()
+        due = [
+            station
+            for station in self.stations
+            if station.next_update is None or station.next_update <= now
+        ]
+
+        async def async_refresh_station(station):
+            await asyncio.sleep(random.uniform(0, STATION_JITTER))
+            async with semaphore:
+                await station.async_refresh()
+
+        await asyncio.gather(*(async_refresh_station(station) for station in due))
+
+        next_updates = [
+            station.next_update for station in self.stations if station.next_update
+        ]
+        if next_updates:
+            self.update_interval = max(
+                MIN_UPDATE_INTERVAL, min(next_updates) - dt.utcnow()
+            )
+
+        if not any(station.last_update_success for station in self.stations):
+            raise UpdateFailed("Error fetching every Environment Canada station")
+        return {station.name: station.data for station in self.stations}
+
@@ -0,0 +1,153 @@
+"""Fast alert-only refreshes for Environment Canada stations."""
+import asyncio
+import datetime
+from http import HTTPStatus
+import logging
+import re
+from types import MappingProxyType
+from xml.etree import ElementTree
+
+from aiohttp import ClientError
+import async_timeout
+from yarl import URL
+
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
+import homeassistant.util.dt as dt
+
+from .breaker import get_breaker
+from .session import async_get_session
+
+_LOGGER = logging.getLogger(__name__)
+
+ALERTS_UPDATE_INTERVAL = datetime.timedelta(minutes=2)
+ALERTS_TIMEOUT = 10
+
+# Alert categories and the title patterns env_canada sorts events by, so
+# alerts read here match those parsed from the full document
+ALERT_PATTERNS = {
+    "warnings": {
+        "english": r".*WARNING((?!ENDED).)*$",
+        "french": r".*(ALERTE|AVERTISSEMENT)((?!TERMINÉ).)*$",
+    },
+    "watches": {
+        "english": r".*WATCH((?!ENDED).)*$",
+        "french": r".*VEILLE((?!TERMINÉ).)*$",
+    },
+    "advisories": {
+        "english": r".*ADVISORY((?!ENDED).)*$",
+        "french": r".*AVIS((?!TERMINÉ).)*$",
+    },
+    "statements": {
+        "english": r".*STATEMENT((?!ENDED).)*$",
+        "french": r".*BULLETIN((?!TERMINÉ).)*$",
+    },
+    "endings": {
+        "english": r".*ENDED",
+        "french": r".*TERMINÉE?",
+    },
+}
+
+
+class ECAlertsUpdateCoordinator(DataUpdateCoordinator):
+    """Refresh one station's alerts more often than its full citypage."""
+
+    def __init__(self, hass, station):
+        """Initialize the alert refresh for a station."""
+        super().__init__(
+            hass,
+            _LOGGER,
+            name=f"{station.name} alerts",
+            update_interval=ALERTS_UPDATE_INTERVAL,
+        )
+        self.station = station
+        self.updated = None
+        self._validators = {}
+
+    async def _async_update_data(self):
+        """Fetch the alerts and merge any change into the station's data."""
+        url = self.station.citypage_url
+        if self.station.data is None or url is None:
+            return self.data
+
+        # Share the citypage host's breaker, so a failing host is not polled
+        breaker = get_breaker(self.hass, URL(url).host)
+        if not breaker.allow():
+            return self.data
+
+        session = async_get_session(self.hass)
+        timings = self.station.timings
+        try:
+            async with async_timeout.timeout(ALERTS_TIMEOUT):
+                with timings.span("alerts"):
+                    async with session.get(url, headers=self._validators) as response:
+                        not_modified = response.status == HTTPStatus.NOT_MODIFIED
+                        timings.hit("alerts", not_modified)
+                        if not_modified:
+                            breaker.success()
+                            return self.data
+                        response.raise_for_status()
+                        alerts = await async_read_alerts(
+                            response, self.station.ec_data.language
+                        )
+                        validators = {}
+                        if "ETag" in response.headers:
+                            validators["If-None-Match"] = response.headers["ETag"]
+                        if "Last-Modified" in response.headers:
+                            validators["If-Modified-Since"] = response.headers[
+                                "Last-Modified"
+                            ]
+        except (asyncio.TimeoutError, ClientError) as err:
+            breaker.failure()
+            raise UpdateFailed(f"Error fetching {self.name}: {err}") from err
+        except ElementTree.ParseError as err:
+            raise UpdateFailed(f"Error parsing {self.name}: {err}") from err
+
+        breaker.success()
+        changed = bool(self._validators)
+        self._validators = validators
+        self.updated = dt.utcnow()
+        self.station.update_alerts(alerts)
+        if changed:
+            # A new citypage was published, so refresh its conditions and
+            # forecasts now rather than when the station next expects one
+            self.hass.async_create_task(self.station.async_request_refresh())
+        return alerts
+
+
+async def async_read_alerts(response, language):
+    """Read a citypage response only as far as the end of its warnings.
+
+    The warnings element comes before the conditions and forecasts, so the
+    rest of the document is not parsed. It is still read to the end, which
+    costs a few kilobytes more per refresh: a response released unread is
+    closed instead of returned to the pool, and the next request would
+    then pay for a new connection and TLS handshake.
+    """
+    parser = ElementTree.XMLPullParser(events=("end",))
+    alerts = {category: [] for category in ALERT_PATTERNS}
+
+    async for chunk in response.content.iter_chunked(4096):
+        parser.feed(chunk)
+        for _, element in parser.read_events():
+            if element.tag == "event":
+                title = element.get("description", "").strip()
+                date = element.find("./dateTime[last()]/textSummary")
+                alert = MappingProxyType(
+                    {
+                        "title": title.title(),
+                        "date": date.text if date is not None else None,
+                    }
+                )
+                for category, patterns in ALERT_PATTERNS.items():
+                    if re.search(patterns[language], title):
+                        alerts[category].append(alert)
+            elif element.tag in ("warnings", "currentConditions"):
+                await response.content.read()
+                return freeze_alerts(alerts)
+
+    return freeze_alerts(alerts)
+
+
+def freeze_alerts(alerts):
+    """Return alert lists as read-only snapshot values."""
+    return {category: tuple(events) for category, events in alerts.items()}
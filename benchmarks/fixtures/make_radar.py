@@ -0,0 +1,66 @@
+"""Write radar_loop.gif, a synthetic stand-in for a GeoMet radar loop.
+
+The frames match what env_canada's ECRadar produces: 800 by 800 pixel
+palette images of a base map with a semi-transparent precipitation
+overlay, ten minutes apart. Real radar imagery cannot be recorded
+offline, so the overlay is a few rain bands drifting across the map.
+"""
+import io
+import math
+import os
+
+from PIL import Image, ImageDraw
+
+SIZE = 800
+FRAMES = 19
+PALETTE = [(153, 204, 255), (0, 153, 0), (255, 255, 0), (255, 153, 0), (255, 0, 0)]
+
+
+def base_map():
+    """Return land, water and roads in muted colours."""
+    image = Image.new("RGBA", (SIZE, SIZE), (236, 232, 220, 255))
+    draw = ImageDraw.Draw(image)
+    draw.ellipse((520, -120, 1000, 300), fill=(170, 200, 230, 255))
+    draw.polygon(
+        [(0, 560), (260, 500), (420, 800), (0, 800)], fill=(170, 200, 230, 255)
+    )
+    for offset in range(0, SIZE, 160):
+        draw.line((offset, 0, offset + 240, SIZE), fill=(200, 190, 170, 255), width=3)
+        draw.line((0, offset, SIZE, offset + 80), fill=(210, 200, 180, 255), width=2)
+    return image
+
+
+def precipitation(step):
+    """Return rain bands moved a little further for each frame."""
+    overlay = Image.new("RGBA", (SIZE, SIZE), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(overlay)
+    for band in range(4):
+        x = (80 + band * 190 + step * 14) % (SIZE + 200) - 100
+        y = 180 + 120 * math.sin(band + step / 6)
+        for level, colour in enumerate(PALETTE):
+            radius = 110 - level * 20
+            draw.ellipse(
+                (x - radius, y - radius / 2, x + radius, y + radius / 2),
+                fill=(*colour, 166),
+            )
+    return overlay
+
+
+def main():
+    """Write the loop next to this script."""
+    base = base_map()
+    frames = [
+        Image.alpha_composite(base, precipitation(step)).convert("RGB").quantize()
+        for step in range(FRAMES)
+    ]
+    output = io.BytesIO()
+    frames[0].save(
+        output, format="GIF", save_all=True, append_images=frames[1:], duration=200
+    )
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "radar_loop.gif")
+    with open(path, "wb") as loop:
+        loop.write(output.getvalue())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,397 @@
+"""Benchmark the integration offline against recorded Environment Canada data.
+
+Usage: python benchmarks/run.py [--quick] [--output FILE] [NAME ...]
+
+Each benchmark prints a line of statistics to stderr; the results are
+written as JSON to stdout, or to the output file. Names limit the run to
+benchmarks whose names start with one of them.
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import support
+
+BENCHMARKS = []
+
+
+def benchmark(func):
+    """Register a benchmark group."""
+    BENCHMARKS.append(func)
+    return func
+
+
+class Runner:
+    """Time benchmarks and collect their statistics."""
+
+    def __init__(self, hass, server, quick, names):
+        """Initialize the runner."""
+        self.hass = hass
+        self.server = server
+        self.quick = quick
+        self.names = names
+        self.results = []
+
+    def wanted(self, name):
+        """Return whether a benchmark was asked for."""
+        return not self.names or any(name.startswith(prefix) for prefix in self.names)
+
+    def measure(self, name, func, number=1000, repeat=20):
+        """Time a function, calling it number times for each sample."""
+        if not self.wanted(name):
+            return
+        number, repeat = self._scale(number, repeat)
+        func()
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in range(number):
+                func()
+            samples.append((time.perf_counter() - start) / number)
+        self._record(name, samples, number)
+
+    async def async_measure(self, name, func, setup=None, repeat=20):
+        """Time a coroutine function, one call per sample, after its setup."""
+        if not self.wanted(name):
+            return
+        _, repeat = self._scale(1, repeat)
+        samples = []
+        for _ in range(repeat):
+            if setup is not None:
+                await setup()
+            start = time.perf_counter()
+            await func()
+            samples.append(time.perf_counter() - start)
+        self._record(name, samples, 1)
+
+    def _scale(self, number, repeat):
+        """Return fewer calls and samples for a quick run."""
+        if self.quick:
+            return max(1, number // 10), max(3, repeat // 4)
+        return number, repeat
+
+    def record_memory(self, name, **stats):
+        """Keep a benchmark's memory statistics, in KiB."""
+        stats = {key: round(value / 1024, 1) for key, value in stats.items()}
+        self.results.append({"name": name, **{f"{k}_kib": v for k, v in stats.items()}})
+        print(
+            f"{name:40} "
+            + "  ".join(f"{key} {value:.1f} KiB" for key, value in stats.items()),
+            file=sys.stderr,
+        )
+
+    def _record(self, name, samples, number):
+        """Keep a benchmark's statistics, in microseconds per call."""
+        samples = sorted(sample * 1e6 for sample in samples)
+        result = {
+            "name": name,
+            "samples": len(samples),
+            "calls_per_sample": number,
+            "min_us": round(samples[0], 3),
+            "median_us": round(statistics.median(samples), 3),
+            "mean_us": round(statistics.fmean(samples), 3),
+            "p95_us": round(samples[max(0, -(-95 * len(samples) // 100) - 1)], 3),
+            "max_us": round(samples[-1], 3),
+        }
+        self.results.append(result)
+        print(
+            f"{name:40} median {result['median_us']:>12.3f} us"
+            f"  min {result['min_us']:>12.3f} us",
+            file=sys.stderr,
+        )
+
+
+@benchmark
+async def bench_forecast(runner):
+    """Build daily and hourly forecasts from parsed documents."""
+    weather = support.load_module("weather")
+    for language in support.LANGUAGES:
+        ec_data = support.parsed_weather(language)
+        for forecast_type in ("daily", "hourly"):
+            runner.measure(
+                f"get_forecast.{forecast_type}.{language}",
+                lambda ec_data=ec_data, forecast_type=forecast_type: (
+                    weather.get_forecast(ec_data, forecast_type)
+                ),
+            )
+
+
+@benchmark
+async def bench_forecast_reads(runner):
+    """Read a weather entity's forecast repeatedly, as the frontend does.
+
+    Rebuilding is what every read cost before the forecast was cached;
+    reads after an update rebuild only once, when the entity writes its
+    state.
+    """
+    integration = support.load_integration()
+    weather = support.load_module("weather")
+    coordinator = integration.get_weather_data(runner.hass, support.STATION, None)
+    if coordinator.data is None:
+        await coordinator.async_refresh()
+    ec_data = coordinator.ec_data
+
+    for forecast_type in ("daily", "hourly"):
+        entity = weather.ECWeatherHA(
+            coordinator,
+            weather.PLATFORM_SCHEMA(
+                {"platform": "environment_canada", "forecast": forecast_type}
+            ),
+        )
+        await entity.async_add_to_hass(runner.hass, f"weather.{forecast_type}")
+
+        def read(entity=entity):
+            return entity.forecast
+
+        def update_and_read(entity=entity):
+            entity._handle_coordinator_update()  # pylint: disable=protected-access
+            for _ in range(10):
+                entity.forecast  # pylint: disable=pointless-statement
+
+        runner.measure(
+            f"weather.forecast.{forecast_type}.rebuild",
+            lambda forecast_type=forecast_type: (
+                weather.get_forecast(ec_data, forecast_type)
+            ),
+        )
+        runner.measure(f"weather.forecast.{forecast_type}.cached", read)
+        runner.measure(
+            f"weather.forecast.{forecast_type}.update_then_10_reads", update_and_read
+        )
+        await entity.async_remove()
+
+
+@benchmark
+async def bench_icon_codes(runner):
+    """Look up the condition of every icon code."""
+    weather = support.load_module("weather")
+    codes = range(49)
+
+    def lookup_all():
+        for code in codes:
+            weather.icon_code_to_condition(code)
+
+    runner.measure("icon_code_to_condition.all_codes", lookup_all)
+
+
+@benchmark
+async def bench_refresh(runner):
+    """Refresh a station end to end through the local citypage server."""
+    integration = support.load_integration()
+    for language in support.LANGUAGES:
+        coordinator = integration.get_weather_data(
+            runner.hass, support.STATION, None, language
+        )
+
+        async def refresh(coordinator=coordinator):
+            await coordinator.async_refresh()
+            await runner.hass.async_block_till_done()
+            if not coordinator.last_update_success:
+                raise RuntimeError(f"{coordinator.name} failed to refresh")
+
+        await refresh()
+
+        async def publish():
+            # Let any refresh queued by the last changed alerts finish first
+            await runner.hass.async_block_till_done()
+            runner.server.publish()
+
+        async def refresh_alerts(coordinator=coordinator):
+            await coordinator.alerts.async_refresh()
+            if not coordinator.alerts.last_update_success:
+                raise RuntimeError(f"{coordinator.alerts.name} failed to refresh")
+
+        await runner.async_measure(f"refresh.modified.{language}", refresh, publish)
+        await runner.async_measure(f"refresh.not_modified.{language}", refresh)
+        await runner.async_measure(
+            f"refresh.alerts.{language}", refresh_alerts, publish
+        )
+        await runner.hass.async_block_till_done()
+
+
+@benchmark
+async def bench_sensors(runner):
+    """Read the state and attributes of every sensor of a station."""
+    integration = support.load_integration()
+    sensor = support.load_module("sensor")
+    for language in support.LANGUAGES:
+        coordinator = integration.get_weather_data(
+            runner.hass, support.STATION, None, language
+        )
+        if coordinator.data is None:
+            await coordinator.async_refresh()
+        sensors = [
+            sensor.ECSensor(
+                coordinator,
+                coordinator,
+                sensor_type,
+                language,
+                coordinator.ec_data.metadata,
+            )
+            for sensor_type in coordinator.data
+        ]
+
+        def states(sensors=sensors):
+            for entity in sensors:
+                entity.state  # pylint: disable=pointless-statement
+
+        def attributes(sensors=sensors):
+            for entity in sensors:
+                entity.device_state_attributes  # pylint: disable=pointless-statement
+
+        runner.measure(f"sensor.state.{language}", states)
+        runner.measure(f"sensor.device_state_attributes.{language}", attributes)
+
+
+@benchmark
+async def bench_radar(runner):
+    """Download, extend and render a radar loop from recorded frames."""
+    from homeassistant.util import dt  # pylint: disable=import-outside-toplevel
+
+    radar = support.load_module("radar")
+    camera = support.load_module("camera")
+    radar_data = radar.get_radar_data(runner.hass, (45.4, -75.7), None)
+    radar_data.loop_enabled = True
+    radar_data.still_enabled = True
+
+    async def reload_loop():
+        radar_data.next_update = None
+        radar_data._loop_times = []  # pylint: disable=protected-access
+
+    async def publish():
+        radar_data.radar_object.publish()
+        dt.travel(radar.FRAME_INTERVAL)
+        radar_data.next_update = None
+
+    await runner.async_measure("radar.load_loop", radar_data.async_update, reload_loop)
+    await runner.async_measure("radar.extend_loop", radar_data.async_update, publish)
+
+    renders = {
+        "medium_gif": (None, 2, "gif"),
+        "small_png": (1, 4, "png"),
+        "full_webp": (None, 1, "webp"),
+    }
+    for name, (frame_count, scale, image_format) in renders.items():
+        entity = camera.ECCamera(
+            radar_data, None, None, frame_count, scale, image_format
+        )
+        entity.hass = runner.hass
+
+        async def clear_renders():
+            radar_data._renders = {}  # pylint: disable=protected-access
+
+        await runner.async_measure(
+            f"radar.render.{name}", entity.async_camera_image, clear_renders
+        )
+        await runner.async_measure(
+            f"radar.render.{name}.cached", entity.async_camera_image
+        )
+
+
+@benchmark
+async def bench_snapshot_memory(runner):
+    """Trace memory over a simulated day of refreshes every five minutes.
+
+    A new citypage is published every hour, and the other refreshes find
+    it unchanged. Each refresh replaces the last snapshot, so retained
+    memory should not grow over the day.
+    """
+    from homeassistant.util import dt  # pylint: disable=import-outside-toplevel
+
+    integration = support.load_integration()
+    hours = 6 if runner.quick else 24
+    for language in support.LANGUAGES:
+        name = f"memory.build_snapshot.{language}"
+        if runner.wanted(name):
+            start = dt.utcnow()
+            documents = [
+                support.parsed_weather(language, start + datetime.timedelta(hours=hour))
+                for hour in range(hours)
+            ]
+            tracemalloc.start()
+            before = tracemalloc.get_traced_memory()[0]
+            snapshot = integration.build_snapshot(documents[0])
+            size = tracemalloc.get_traced_memory()[0] - before
+            peaks = []
+            for ec_data in documents:
+                tracemalloc.reset_peak()
+                current = tracemalloc.get_traced_memory()[0]
+                snapshot = integration.build_snapshot(ec_data)
+                peaks.append(tracemalloc.get_traced_memory()[1] - current)
+            tracemalloc.stop()
+            del snapshot
+            runner.record_memory(name, snapshot=size, peak=max(peaks))
+
+        name = f"memory.refresh_day.{language}"
+        if not runner.wanted(name):
+            continue
+        coordinator = integration.get_weather_data(
+            runner.hass, support.STATION, None, language
+        )
+        if coordinator.data is None:
+            await coordinator.async_refresh()
+        interval = datetime.timedelta(minutes=5)
+        tracemalloc.start()
+        start = None
+        for refresh in range(hours * 12):
+            dt.travel(interval)
+            if refresh % 12 == 0:
+                runner.server.publish(hour=dt.utcnow())
+            await coordinator.async_refresh()
+            await runner.hass.async_block_till_done()
+            if refresh == 11:
+                # Measure growth from the end of the first hour, once warm
+                start = tracemalloc.get_traced_memory()[0]
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        runner.record_memory(name, peak=peak, growth=current - start)
+
+
+async def async_run(quick, names):
+    """Run every benchmark and return the results."""
+    server = support.CitypageServer()
+    await server.async_start()
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = await support.async_setup_hass(config_dir, server)
+        runner = Runner(hass, server, quick, names)
+        try:
+            for bench in BENCHMARKS:
+                await bench(runner)
+        finally:
+            await hass.async_stop()
+            await server.async_stop()
+    return runner.results
+
+
+def main(argv=None):
+    """Run the benchmarks and write their results as JSON."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("names", nargs="*", help="benchmark name prefixes to run")
+    parser.add_argument("--quick", action="store_true", help="run fewer iterations")
+    parser.add_argument("--output", help="write the JSON results to a file")
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(async_run(args.quick, args.names))
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "quick": args.quick,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            json.dump(report, output, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+"""Offline stand-in for env_canada 0.5.4's ECWeather and ECRadar.
+
+ECWeather downloads the citypage document from WEATHER_URL with its own
+session and parses it into the same structures as env_canada. ECRadar
+serves frames from a recorded loop, and publish() moves it on to the
+next frame.
+"""
+import datetime
+import io
+import os
+import re
+import xml.etree.ElementTree as et
+
+from aiohttp import ClientSession
+from PIL import Image, ImageSequence
+
+FIXTURES = os.path.join(os.path.dirname(__file__), os.pardir, os.pardir, "fixtures")
+
+WEATHER_URL = "https://dd.weather.gc.ca/citypage_weather/xml/{}_{}.xml"
+
+# Condition name: xpath, value type and the attribute holding the value
+CONDITIONS = {
+    "temperature": ("./currentConditions/temperature", "float", None),
+    "dewpoint": ("./currentConditions/dewpoint", "float", None),
+    "wind_chill": ("./currentConditions/windChill", "int", None),
+    "humidex": ("./currentConditions/humidex", "int", None),
+    "pressure": ("./currentConditions/pressure", "float", None),
+    "tendency": ("./currentConditions/pressure", "str", "tendency"),
+    "humidity": ("./currentConditions/relativeHumidity", "int", None),
+    "visibility": ("./currentConditions/visibility", "float", None),
+    "condition": ("./currentConditions/condition", "str", None),
+    "wind_speed": ("./currentConditions/wind/speed", "int", None),
+    "wind_gust": ("./currentConditions/wind/gust", "int", None),
+    "wind_dir": ("./currentConditions/wind/direction", "str", None),
+    "wind_bearing": ("./currentConditions/wind/bearing", "float", None),
+    "high_temp": (
+        './forecastGroup/forecast/temperatures/temperature[@class="high"]',
+        "int",
+        None,
+    ),
+    "low_temp": (
+        './forecastGroup/forecast/temperatures/temperature[@class="low"]',
+        "int",
+        None,
+    ),
+    "uv_index": ("./forecastGroup/forecast/uv/index", "int", None),
+    "pop": ("./forecastGroup/forecast/abbreviatedForecast/pop", "int", None),
+    "icon_code": ("./currentConditions/iconCode", "str", None),
+    "precip_yesterday": ("./yesterdayConditions/precip", "float", None),
+}
+
+ALERTS = {
+    "warnings": {
+        "english": r".*WARNING((?!ENDED).)*$",
+        "french": r".*(ALERTE|AVERTISSEMENT)((?!TERMINÉ).)*$",
+    },
+    "watches": {
+        "english": r".*WATCH((?!ENDED).)*$",
+        "french": r".*VEILLE((?!TERMINÉ).)*$",
+    },
+    "advisories": {
+        "english": r".*ADVISORY((?!ENDED).)*$",
+        "french": r".*AVIS((?!TERMINÉ).)*$",
+    },
+    "statements": {
+        "english": r".*STATEMENT((?!ENDED).)*$",
+        "french": r".*BULLETIN((?!TERMINÉ).)*$",
+    },
+    "endings": {"english": r".*ENDED", "french": r".*TERMINÉE?"},
+}
+
+METADATA = {
+    "timestamp": "./currentConditions/dateTime/timeStamp",
+    "location": "./location/name",
+    "station": "./currentConditions/station",
+}
+
+
+def parse_timestamp(timestamp):
+    """Return a citypage timestamp as a UTC datetime."""
+    layout = "%Y%m%d%H%M%S" if len(timestamp) == 14 else "%Y%m%d%H%M"
+    return datetime.datetime.strptime(timestamp, layout).replace(
+        tzinfo=datetime.timezone.utc
+    )
+
+
+class ECWeather:
+    """Weather data for one station, parsed as env_canada does."""
+
+    def __init__(self, station_id=None, coordinates=None, language="english"):
+        """Initialize the data object."""
+        self.station_id = station_id
+        self.coordinates = coordinates
+        self.language = language
+        self.metadata = {}
+        self.conditions = {}
+        self.alerts = {}
+        self.daily_forecasts = []
+        self.hourly_forecasts = []
+        self.forecast_time = ""
+
+    async def update(self):
+        """Download and parse the station's citypage document."""
+        async with ClientSession(raise_for_status=True) as session:
+            response = await session.get(
+                WEATHER_URL.format(self.station_id, self.language[0]), timeout=10
+            )
+            result = await response.read()
+        self.parse(result)
+
+    def parse(self, document):
+        """Replace the data with that parsed from a citypage document."""
+        tree = et.fromstring(document)
+
+        for name, xpath in METADATA.items():
+            element = tree.find(xpath)
+            if element is None:
+                self.metadata[name] = None
+            elif name == "timestamp":
+                self.metadata[name] = parse_timestamp(element.text)
+            else:
+                self.metadata[name] = element.text
+
+        for name, meta in CONDITIONS.items():
+            self.conditions[name] = {"label": name, **_condition(tree, *meta)}
+
+        period = tree.find("./forecastGroup/forecast/period")
+        summary = tree.findtext("./forecastGroup/forecast/textSummary")
+        self.conditions["text_summary"] = {
+            "label": "text_summary",
+            "value": ". ".join([period.get("textForecastName"), summary]),
+        }
+
+        for category in ALERTS:
+            self.alerts[category] = {"value": [], "label": category}
+        for event in tree.findall("./warnings/event"):
+            title = event.get("description").strip()
+            for category, patterns in ALERTS.items():
+                if re.search(patterns[self.language], title):
+                    self.alerts[category]["value"].append(
+                        {
+                            "title": title.title(),
+                            "date": event.find("./dateTime[last()]/textSummary").text,
+                        }
+                    )
+
+        self.forecast_time = parse_timestamp(
+            tree.findtext("./forecastGroup/dateTime/timeStamp")
+        )
+        self.daily_forecasts = []
+        self.hourly_forecasts = []
+        for forecast in tree.findall("./forecastGroup/forecast"):
+            self.daily_forecasts.append(
+                {
+                    "period": forecast.findtext("period"),
+                    "text_summary": forecast.findtext("textSummary"),
+                    "icon_code": forecast.findtext("./abbreviatedForecast/iconCode"),
+                    "temperature": int(forecast.findtext("./temperatures/temperature")),
+                    "temperature_class": forecast.find(
+                        "./temperatures/temperature"
+                    ).get("class"),
+                    "precip_probability": int(
+                        forecast.findtext("./abbreviatedForecast/pop") or "0"
+                    ),
+                }
+            )
+        for forecast in tree.findall("./hourlyForecastGroup/hourlyForecast"):
+            self.hourly_forecasts.append(
+                {
+                    "period": parse_timestamp(forecast.get("dateTimeUTC")),
+                    "condition": forecast.findtext("./condition"),
+                    "temperature": int(forecast.findtext("./temperature")),
+                    "icon_code": forecast.findtext("./iconCode"),
+                    "precip_probability": int(forecast.findtext("./lop") or "0"),
+                }
+            )
+
+
+def _condition(tree, xpath, value_type, attribute):
+    """Return one parsed condition value and its unit."""
+    element = tree.find(xpath)
+    if element is None or element.text is None:
+        return {"value": None}
+    if attribute:
+        return {"value": element.get(attribute)}
+    if value_type == "int":
+        value = int(element.text)
+    elif value_type == "float":
+        value = 0.0 if element.text == "Trace" else float(element.text)
+    else:
+        value = element.text
+    if element.get("units"):
+        return {"value": value, "unit": element.get("units")}
+    return {"value": value}
+
+
+class ECRadar:
+    """Radar frames replayed from a recorded loop, ten minutes apart."""
+
+    FRAME_INTERVAL = datetime.timedelta(minutes=10)
+    _frames = None
+
+    def __init__(self, coordinates=None, precip_type=None, start=None):
+        """Initialize the radar at the end of the recorded loop."""
+        self.coordinates = coordinates
+        self.precip_type = precip_type
+        self.timestamp = None
+        self._start = start or datetime.datetime(
+            2021, 9, 15, 15, 0, tzinfo=datetime.timezone.utc
+        )
+        self._published = len(self._load_frames()) - 1
+        self._loops = {}
+
+    @classmethod
+    def _load_frames(cls):
+        """Return the recorded loop's frames as PNG images, read once."""
+        if cls._frames is None:
+            with open(os.path.join(FIXTURES, "radar_loop.gif"), "rb") as loop:
+                image = Image.open(io.BytesIO(loop.read()))
+                cls._frames = []
+                for frame in ImageSequence.Iterator(image):
+                    output = io.BytesIO()
+                    frame.save(output, format="PNG")
+                    cls._frames.append(output.getvalue())
+        return cls._frames
+
+    def publish(self, count=1):
+        """Make the next frames available, as the radar does every ten minutes."""
+        self._published += count
+
+    def _get_dimensions(self):
+        """Return the times of the oldest and newest available frames."""
+        frames = len(self._load_frames())
+        end = self._start + self._published * self.FRAME_INTERVAL
+        self.timestamp = end.isoformat()
+        return end - (frames - 1) * self.FRAME_INTERVAL, end
+
+    async def get_latest_frame(self):
+        """Return the newest frame as a PNG image."""
+        self._get_dimensions()
+        frames = self._load_frames()
+        return frames[self._published % len(frames)]
+
+    async def get_loop(self):
+        """Return every available frame as an animated GIF.
+
+        Each loop is assembled once, so only the integration's own work
+        is timed when a loop is downloaded again.
+        """
+        self._get_dimensions()
+        if self._published not in self._loops:
+            frames = self._load_frames()
+            images = [
+                Image.open(io.BytesIO(frames[(self._published - age) % len(frames)]))
+                for age in reversed(range(len(frames)))
+            ]
+            output = io.BytesIO()
+            images[0].save(
+                output,
+                format="GIF",
+                save_all=True,
+                append_images=images[1:],
+                duration=200,
+            )
+            self._loops[self._published] = output.getvalue()
+        return self._loops[self._published]
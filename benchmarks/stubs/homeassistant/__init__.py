@@ -0,0 +1 @@
+"""Minimal stand-in for Home Assistant, for running the integration offline."""
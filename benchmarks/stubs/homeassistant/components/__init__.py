@@ -0,0 +1 @@
+"""Stand-ins for the Home Assistant components the integration uses."""
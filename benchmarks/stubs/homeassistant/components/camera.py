@@ -0,0 +1,16 @@
+"""Camera platform base."""
+from homeassistant.helpers.config_validation import PLATFORM_SCHEMA  # noqa: F401
+from homeassistant.helpers.entity import Entity
+
+
+class Camera(Entity):
+    """Base class for cameras."""
+
+    def __init__(self):
+        """Initialize the camera."""
+        super().__init__()
+        self.content_type = "image/jpeg"
+
+    async def async_camera_image(self):
+        """Return bytes of the camera image."""
+        return None
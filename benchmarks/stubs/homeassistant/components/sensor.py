@@ -0,0 +1,7 @@
+"""Sensor platform base."""
+from homeassistant.helpers.config_validation import PLATFORM_SCHEMA  # noqa: F401
+from homeassistant.helpers.entity import Entity
+
+
+class SensorEntity(Entity):
+    """Base class for sensors."""
@@ -0,0 +1,69 @@
+"""Weather platform base and forecast attributes."""
+from homeassistant.helpers.config_validation import PLATFORM_SCHEMA  # noqa: F401
+from homeassistant.helpers.entity import Entity
+
+ATTR_CONDITION_CLEAR_NIGHT = "clear-night"
+ATTR_CONDITION_CLOUDY = "cloudy"
+ATTR_CONDITION_EXCEPTIONAL = "exceptional"
+ATTR_CONDITION_FOG = "fog"
+ATTR_CONDITION_HAIL = "hail"
+ATTR_CONDITION_LIGHTNING = "lightning"
+ATTR_CONDITION_LIGHTNING_RAINY = "lightning-rainy"
+ATTR_CONDITION_PARTLYCLOUDY = "partlycloudy"
+ATTR_CONDITION_POURING = "pouring"
+ATTR_CONDITION_RAINY = "rainy"
+ATTR_CONDITION_SNOWY = "snowy"
+ATTR_CONDITION_SNOWY_RAINY = "snowy-rainy"
+ATTR_CONDITION_SUNNY = "sunny"
+ATTR_CONDITION_WINDY = "windy"
+ATTR_CONDITION_WINDY_VARIANT = "windy-variant"
+
+ATTR_FORECAST_CONDITION = "condition"
+ATTR_FORECAST_PRECIPITATION = "precipitation"
+ATTR_FORECAST_PRECIPITATION_PROBABILITY = "precipitation_probability"
+ATTR_FORECAST_TEMP = "temperature"
+ATTR_FORECAST_TEMP_LOW = "templow"
+ATTR_FORECAST_TIME = "datetime"
+ATTR_FORECAST_WIND_BEARING = "wind_bearing"
+ATTR_FORECAST_WIND_SPEED = "wind_speed"
+
+ATTR_WEATHER_TEMPERATURE = "temperature"
+ATTR_FORECAST = "forecast"
+ATTR_WEATHER_OPTIONAL = (
+    "humidity",
+    "pressure",
+    "wind_speed",
+    "wind_bearing",
+    "visibility",
+)
+
+
+class WeatherEntity(Entity):
+    """Base class for weather entities."""
+
+    @property
+    def forecast(self):
+        """Return the forecast."""
+        return None
+
+    @property
+    def condition(self):
+        """Return the current condition."""
+        raise NotImplementedError
+
+    @property
+    def state(self):
+        """Return the current condition."""
+        return self.condition
+
+    @property
+    def state_attributes(self):
+        """Return the temperature and forecast, as the weather entity does."""
+        attributes = {ATTR_WEATHER_TEMPERATURE: self.temperature}
+        for name in ATTR_WEATHER_OPTIONAL:
+            value = getattr(self, name)
+            if value is not None:
+                attributes[name] = value
+        if self.forecast is not None:
+            attributes[ATTR_FORECAST] = self.forecast
+        return attributes
@@ -0,0 +1,63 @@
+"""Websocket command registration."""
+import functools
+
+import voluptuous as vol
+
+DATA_COMMANDS = "websocket_api"
+
+
+def websocket_command(schema):
+    """Attach a message schema to a command handler."""
+    command = schema["type"]
+
+    def decorate(func):
+        func._ws_schema = vol.Schema({vol.Required("id"): int, **schema})
+        func._ws_command = command
+        return func
+
+    return decorate
+
+
+def async_response(func):
+    """Mark a coroutine as a command handler."""
+
+    @functools.wraps(func)
+    async def handle(hass, connection, msg):
+        await func(hass, connection, msg)
+
+    return handle
+
+
+def async_register_command(hass, handler):
+    """Register a command handler by its message type."""
+    hass.data.setdefault(DATA_COMMANDS, {})[handler._ws_command] = handler
+
+
+class ActiveConnection:
+    """A connection that keeps the results sent on it."""
+
+    def __init__(self):
+        """Initialize an empty connection."""
+        self.messages = []
+
+    def send_result(self, msg_id, result=None):
+        """Send a command's result."""
+        self.messages.append({"id": msg_id, "success": True, "result": result})
+
+    def send_error(self, msg_id, code, message):
+        """Send a command's error."""
+        error = {"code": code, "message": message}
+        self.messages.append({"id": msg_id, "success": False, "error": error})
+
+
+async def async_handle(hass, connection, msg):
+    """Validate a message and run its command, as a connection does."""
+    handler = hass.data[DATA_COMMANDS][msg["type"]]
+    try:
+        msg = handler._ws_schema(msg)
+    except vol.Invalid as err:
+        connection.send_error(
+            msg.get("id"), "invalid_format", f"Message incorrectly formatted: {err}"
+        )
+        return
+    await handler(hass, connection, msg)
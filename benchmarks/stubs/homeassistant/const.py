@@ -0,0 +1,28 @@
+"""Constants used by the integration, with Home Assistant 2021.9 values."""
+
+ATTR_ATTRIBUTION = "attribution"
+ATTR_DEVICE_CLASS = "device_class"
+ATTR_ICON = "icon"
+ATTR_LOCATION = "location"
+ATTR_TIME = "time"
+
+CONF_LATITUDE = "latitude"
+CONF_LONGITUDE = "longitude"
+CONF_NAME = "name"
+CONF_PLATFORM = "platform"
+CONF_UNIQUE_ID = "unique_id"
+
+DEVICE_CLASS_HUMIDITY = "humidity"
+DEVICE_CLASS_PRESSURE = "pressure"
+DEVICE_CLASS_TEMPERATURE = "temperature"
+
+EVENT_HOMEASSISTANT_CLOSE = "homeassistant_close"
+
+DEGREE = "°"
+LENGTH_KILOMETERS = "km"
+LENGTH_MILLIMETERS = "mm"
+PERCENTAGE = "%"
+SPEED_KILOMETERS_PER_HOUR = "km/h"
+TEMP_CELSIUS = "°C"
+TIME_MILLISECONDS = "ms"
+UV_INDEX = "UV index"
@@ -0,0 +1,81 @@
+"""Just enough of the Home Assistant core to run the integration offline."""
+import asyncio
+import os
+
+
+def callback(func):
+    """Mark a function as safe to run in the event loop."""
+    setattr(func, "_hass_callback", True)
+    return func
+
+
+class Config:
+    """Location and configuration directory."""
+
+    def __init__(self, config_dir, latitude=45.4, longitude=-75.7):
+        """Initialize the configuration."""
+        self.config_dir = config_dir
+        self.latitude = latitude
+        self.longitude = longitude
+
+    def path(self, *parts):
+        """Return a path inside the configuration directory."""
+        return os.path.join(self.config_dir, *parts)
+
+
+class EventBus:
+    """Event listeners, fired only when asked."""
+
+    def __init__(self, hass):
+        """Initialize an empty bus."""
+        self.hass = hass
+        self._listeners = {}
+
+    def async_listen_once(self, event_type, listener):
+        """Call a listener the next time an event fires."""
+        self._listeners.setdefault(event_type, []).append(listener)
+
+    async def async_fire(self, event_type):
+        """Fire an event and wait for its listeners."""
+        for listener in self._listeners.pop(event_type, []):
+            result = listener(None)
+            if asyncio.iscoroutine(result):
+                await result
+
+
+class HomeAssistant:
+    """An event loop, shared data and an executor, with no timers.
+
+    Coordinators only refresh when asked, so a benchmark or test controls
+    exactly which refreshes run.
+    """
+
+    def __init__(self, config_dir):
+        """Initialize on the running event loop."""
+        self.loop = asyncio.get_running_loop()
+        self.data = {}
+        self.states = {}
+        self.config = Config(config_dir)
+        self.bus = EventBus(self)
+        self._tasks = set()
+
+    def async_create_task(self, target):
+        """Run a coroutine as a task tracked until it is done."""
+        task = self.loop.create_task(target)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def async_add_executor_job(self, target, *args):
+        """Run a function in the default executor."""
+        return self.loop.run_in_executor(None, target, *args)
+
+    async def async_block_till_done(self):
+        """Wait for every tracked task, including ones they start."""
+        while self._tasks:
+            await asyncio.gather(*self._tasks)
+
+    async def async_stop(self):
+        """Finish pending work and fire the close event."""
+        await self.async_block_till_done()
+        await self.bus.async_fire("homeassistant_close")
@@ -0,0 +1 @@
+"""Stand-ins for the Home Assistant helpers the integration uses."""
@@ -0,0 +1,3 @@
+"""HTTP client helpers."""
+
+SERVER_SOFTWARE = "HomeAssistant/2021.9.0 aiohttp"
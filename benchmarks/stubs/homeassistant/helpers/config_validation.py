@@ -0,0 +1,41 @@
+"""Configuration validators the integration uses."""
+import voluptuous as vol
+
+from homeassistant.const import CONF_PLATFORM
+
+
+def string(value):
+    """Coerce a value to a string."""
+    if value is None:
+        raise vol.Invalid("string value is None")
+    return str(value)
+
+
+def boolean(value):
+    """Validate and coerce a boolean value."""
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        value = value.lower().strip()
+        if value in ("1", "true", "yes", "on", "enable"):
+            return True
+        if value in ("0", "false", "no", "off", "disable"):
+            return False
+    elif isinstance(value, (int, float)):
+        return bool(value)
+    raise vol.Invalid(f"invalid boolean value {value}")
+
+
+def ensure_list(value):
+    """Wrap a value in a list if it is not one."""
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+latitude = vol.All(vol.Coerce(float), vol.Range(min=-90, max=90))
+longitude = vol.All(vol.Coerce(float), vol.Range(min=-180, max=180))
+
+PLATFORM_SCHEMA = vol.Schema(
+    {vol.Required(CONF_PLATFORM): string}, extra=vol.ALLOW_EXTRA
+)
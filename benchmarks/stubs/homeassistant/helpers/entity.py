@@ -0,0 +1,75 @@
+"""Entity base class."""
+
+
+class Entity:
+    """An entity whose written states are kept in hass.states."""
+
+    hass = None
+    entity_id = None
+
+    def __init__(self):
+        """Initialize the entity."""
+        self._on_remove = []
+
+    @property
+    def available(self):
+        """Return whether the entity is available."""
+        return True
+
+    @property
+    def state(self):
+        """Return the entity's state."""
+        return None
+
+    @property
+    def state_attributes(self):
+        """Return the attributes defined by the entity's domain."""
+        return None
+
+    @property
+    def device_state_attributes(self):
+        """Return device specific attributes."""
+        return None
+
+    @property
+    def extra_state_attributes(self):
+        """Return entity specific attributes."""
+        return None
+
+    async def async_added_to_hass(self):
+        """Run when the entity is added."""
+
+    async def async_will_remove_from_hass(self):
+        """Run when the entity is about to be removed."""
+
+    def async_on_remove(self, func):
+        """Call a function when the entity is removed."""
+        if not hasattr(self, "_on_remove"):
+            self._on_remove = []
+        self._on_remove.append(func)
+
+    async def async_add_to_hass(self, hass, entity_id):
+        """Add the entity the way an entity platform would."""
+        self.hass = hass
+        self.entity_id = entity_id
+        await self.async_added_to_hass()
+        self.async_write_ha_state()
+
+    async def async_remove(self):
+        """Remove the entity, calling its removal callbacks."""
+        await self.async_will_remove_from_hass()
+        for func in getattr(self, "_on_remove", []):
+            func()
+        self.hass.states.pop(self.entity_id, None)
+
+    def async_write_ha_state(self):
+        """Read the state and attributes, as writing to the state machine does."""
+        attributes = {}
+        if self.available:
+            state = self.state
+            attributes.update(self.state_attributes or {})
+            attributes.update(self.device_state_attributes or {})
+            attributes.update(self.extra_state_attributes or {})
+        else:
+            state = "unavailable"
+        self.hass.states[self.entity_id] = (state, attributes)
@@ -0,0 +1,65 @@
+"""JSON stores under the configuration directory."""
+import datetime
+import json
+import os
+
+STORAGE_DIR = ".storage"
+
+
+class Store:
+    """A JSON file whose delayed saves are only written when flushed."""
+
+    def __init__(self, hass, version, key):
+        """Initialize the store."""
+        self.hass = hass
+        self.version = version
+        self.key = key
+        self._data_func = None
+
+    @property
+    def path(self):
+        """Return the store's file path."""
+        return self.hass.config.path(STORAGE_DIR, self.key)
+
+    async def async_load(self):
+        """Return the stored data, or None if there is none."""
+        return await self.hass.async_add_executor_job(self._load)
+
+    async def async_save(self, data):
+        """Write data now."""
+        await self.hass.async_add_executor_job(self._write, data)
+
+    def async_delay_save(self, data_func, delay=0):
+        """Remember the data to write at the next flush."""
+        self._data_func = data_func
+
+    async def async_flush(self):
+        """Write the latest delayed save, if any."""
+        if self._data_func is not None:
+            await self.async_save(self._data_func())
+            self._data_func = None
+
+    def _load(self):
+        """Read the store's file."""
+        try:
+            with open(self.path, encoding="utf-8") as stored:
+                return json.load(stored)["data"]
+        except FileNotFoundError:
+            return None
+
+    def _write(self, data):
+        """Write the store's file."""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, "w", encoding="utf-8") as stored:
+            json.dump(
+                {"version": self.version, "key": self.key, "data": data},
+                stored,
+                default=_encode,
+            )
+
+
+def _encode(value):
+    """Encode datetimes the way Home Assistant's JSON encoder does."""
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
@@ -0,0 +1,101 @@
+"""Update coordinators, refreshed only when asked."""
+from homeassistant.helpers.entity import Entity
+
+
+class UpdateFailed(Exception):
+    """Raised when an update failed."""
+
+
+class DataUpdateCoordinator:
+    """Shared data, with listeners called after each refresh.
+
+    There is no timer: refreshes run only when awaited, and the update
+    interval is kept for the integration to read and change.
+    """
+
+    def __init__(self, hass, logger, *, name, update_interval=None, update_method=None):
+        """Initialize the coordinator."""
+        self.hass = hass
+        self.logger = logger
+        self.name = name
+        self.update_interval = update_interval
+        self.update_method = update_method
+        self.data = None
+        self.last_update_success = True
+        self.last_exception = None
+        self._listeners = []
+
+    def async_add_listener(self, update_callback):
+        """Listen for data updates, returning a function that stops listening."""
+        self._listeners.append(update_callback)
+
+        def remove_listener():
+            self._listeners.remove(update_callback)
+
+        return remove_listener
+
+    def async_update_listeners(self):
+        """Call every listener."""
+        for update_callback in list(self._listeners):
+            update_callback()
+
+    async def async_config_entry_first_refresh(self):
+        """Refresh once, as at setup."""
+        await self.async_refresh()
+
+    async def async_request_refresh(self):
+        """Refresh now, without debouncing."""
+        await self.async_refresh()
+
+    async def _async_update_data(self):
+        """Fetch the latest data."""
+        if self.update_method is None:
+            raise NotImplementedError("Update method not implemented")
+        return await self.update_method()
+
+    async def async_refresh(self):
+        """Refresh the data and tell the listeners."""
+        try:
+            self.data = await self._async_update_data()
+        except UpdateFailed as err:
+            self.last_exception = err
+            if self.last_update_success:
+                self.logger.error("Error fetching %s data: %s", self.name, err)
+            self.last_update_success = False
+        else:
+            self.last_exception = None
+            self.last_update_success = True
+        self.async_update_listeners()
+
+
+class CoordinatorEntity(Entity):
+    """An entity that writes its state whenever its coordinator refreshes."""
+
+    def __init__(self, coordinator):
+        """Initialize the entity."""
+        self.coordinator = coordinator
+
+    @property
+    def should_poll(self):
+        """Return that the coordinator updates the entity."""
+        return False
+
+    @property
+    def available(self):
+        """Return whether the last refresh succeeded."""
+        return self.coordinator.last_update_success
+
+    async def async_added_to_hass(self):
+        """Follow the coordinator's refreshes."""
+        await super().async_added_to_hass()
+        self.async_on_remove(
+            self.coordinator.async_add_listener(self._handle_coordinator_update)
+        )
+
+    def _handle_coordinator_update(self):
+        """Write the state after a refresh."""
+        self.async_write_ha_state()
+
+    async def async_update(self):
+        """Refresh the coordinator."""
+        await self.coordinator.async_request_refresh()
@@ -0,0 +1 @@
+"""Stand-ins for the Home Assistant utilities the integration uses."""
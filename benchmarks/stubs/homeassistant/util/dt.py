@@ -0,0 +1,42 @@
+"""Date and time helpers, with UTC as the local time zone.
+
+The clock can be moved forward with travel(), so a run can cover hours
+of polling in seconds.
+"""
+import datetime
+
+UTC = datetime.timezone.utc
+DEFAULT_TIME_ZONE = UTC
+
+_offset = datetime.timedelta(0)
+
+
+def travel(delta):
+    """Move the clock forward."""
+    global _offset  # pylint: disable=global-statement
+    _offset += delta
+
+
+def utcnow():
+    """Return the current time in UTC."""
+    return datetime.datetime.now(UTC) + _offset
+
+
+def now():
+    """Return the current local time."""
+    return utcnow().astimezone(DEFAULT_TIME_ZONE)
+
+
+def as_utc(moment):
+    """Return a datetime in UTC, treating naive ones as local time."""
+    if moment.tzinfo is None:
+        return moment.replace(tzinfo=DEFAULT_TIME_ZONE).astimezone(UTC)
+    return moment.astimezone(UTC)
+
+
+def parse_datetime(dt_str):
+    """Return an ISO 8601 string as a datetime, or None if it is not one."""
+    try:
+        return datetime.datetime.fromisoformat(dt_str.replace("Z", "+00:00"))
+    except ValueError:
+        return None
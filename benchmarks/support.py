@@ -0,0 +1,231 @@
+"""Offline stand-ins shared by the benchmarks and tests.
+
+The integration is loaded from the repository as the environment_canada
+package, against the minimal homeassistant and env_canada packages in
+stubs/. Citypage documents are served by a local HTTP server standing in
+for Environment Canada's.
+"""
+import datetime
+import hashlib
+import importlib
+import importlib.util
+import os
+import re
+import sys
+from typing import NamedTuple
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCHMARKS)
+STUBS = os.path.join(BENCHMARKS, "stubs")
+FIXTURES = os.path.join(BENCHMARKS, "fixtures")
+
+PACKAGE = "environment_canada"
+STATION = "ON/s0000430"
+LANGUAGES = {"english": "en", "french": "fr"}
+
+# Start of the first hourly forecast in the recorded documents
+RECORDED_HOUR = datetime.datetime(2021, 9, 15, 16, tzinfo=datetime.timezone.utc)
+
+if STUBS not in sys.path:
+    sys.path.insert(0, STUBS)
+
+from aiohttp import web  # noqa: E402
+
+
+def load_integration():
+    """Import the repository as the environment_canada package."""
+    if PACKAGE not in sys.modules:
+        spec = importlib.util.spec_from_file_location(
+            PACKAGE,
+            os.path.join(ROOT, "__init__.py"),
+            submodule_search_locations=[ROOT],
+        )
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[PACKAGE] = module
+        spec.loader.exec_module(module)
+    return sys.modules[PACKAGE]
+
+
+def load_module(name):
+    """Import one of the integration's modules."""
+    load_integration()
+    return importlib.import_module(f"{PACKAGE}.{name}")
+
+
+def read_fixture(name):
+    """Return the contents of a fixture file."""
+    with open(os.path.join(FIXTURES, name), "rb") as fixture:
+        return fixture.read()
+
+
+def citypage(language, hour=None):
+    """Return a recorded citypage document, moved to start at an hour.
+
+    Every timestamp is shifted by the same amount, so the first hourly
+    forecast falls in the given hour (by default the current one) and the
+    document reads as if it had just been published.
+    """
+    document = read_fixture(f"citypage_{LANGUAGES[language]}.xml")
+    if hour is None:
+        hour = datetime.datetime.now(datetime.timezone.utc)
+    shift = hour.replace(minute=0, second=0, microsecond=0) - RECORDED_HOUR
+
+    def move(match):
+        timestamp = match.group(2).decode()
+        layout = "%Y%m%d%H%M%S" if len(timestamp) == 14 else "%Y%m%d%H%M"
+        moment = datetime.datetime.strptime(timestamp, layout) + shift
+        return match.group(1) + moment.strftime(layout).encode() + match.group(3)
+
+    return re.sub(
+        rb'(<timeStamp>|dateTimeUTC=")(\d{12}|\d{14})(</timeStamp>|")', move, document
+    )
+
+
+def parsed_weather(language="english", hour=None):
+    """Return an ECWeather filled from a recorded document."""
+    from env_canada import ECWeather  # pylint: disable=import-outside-toplevel
+
+    ec_data = ECWeather(station_id=STATION, language=language)
+    ec_data.parse(citypage(language, hour))
+    return ec_data
+
+
+async def async_setup_hass(config_dir, server):
+    """Return a Home Assistant stand-in with the integration set up.
+
+    The integration and env_canada both fetch citypages from the server.
+    """
+    import env_canada  # pylint: disable=import-outside-toplevel
+    from homeassistant.core import (  # pylint: disable=import-outside-toplevel
+        HomeAssistant,
+    )
+
+    integration = load_integration()
+    integration.CITYPAGE_URL = server.citypage_url
+    env_canada.WEATHER_URL = server.citypage_url
+    load_module("stations").SITE_LIST_URL = server.site_list_url
+    hass = HomeAssistant(config_dir)
+    await integration.async_setup(hass, {})
+    return hass
+
+
+class Request(NamedTuple):
+    """A request the server received, and the client port it came from."""
+
+    method: str
+    path: str
+    port: int
+    user_agent: str
+
+
+class CitypageServer:
+    """Local stand-in for Environment Canada's citypage host.
+
+    Documents are served with an ETag, and conditional requests for an
+    unchanged document get 304 Not Modified. The site list is served too.
+    Every request is recorded with its client port, so connection reuse
+    can be checked. Setting errors to a list of statuses answers that many
+    citypage requests with them, to stand in for an outage.
+    """
+
+    def __init__(self):
+        """Initialize the server with the recorded documents."""
+        self.documents = {
+            (STATION, language[0]): citypage(language) for language in LANGUAGES
+        }
+        self.published = 0
+        self.requests = []
+        self.errors = []
+        self.url = None
+        self._runner = None
+
+    @property
+    def citypage_url(self):
+        """Return the server's citypage URL template."""
+        return f"{self.url}/citypage_weather/xml/{{}}_{{}}.xml"
+
+    @property
+    def site_list_url(self):
+        """Return the server's site list URL."""
+        return f"{self.url}/citypage_weather/docs/site_list_en.csv"
+
+    def connections(self, user_agent=None):
+        """Return how many client connections requests arrived on.
+
+        Given a user agent, only that client's requests are counted.
+        """
+        return len(
+            {
+                request.port
+                for request in self.requests
+                if user_agent is None or request.user_agent == user_agent
+            }
+        )
+
+    def publish(self, station=STATION, hour=None, padding=0):
+        """Publish new documents for a station, changing their ETags.
+
+        Padding adds that many bytes after the document, making it too long
+        to arrive in a single read.
+        """
+        self.published += 1
+        serial = f"<!-- {self.published} {' ' * padding}-->".encode()
+        for language in LANGUAGES:
+            self.documents[(station, language[0])] = citypage(language, hour) + serial
+
+    async def async_start(self):
+        """Start serving on a free local port."""
+        app = web.Application()
+        app.router.add_get(
+            "/citypage_weather/xml/{province}/{site}_{language}.xml", self._handle
+        )
+        app.router.add_get(
+            "/citypage_weather/docs/site_list_en.csv", self._handle_site_list
+        )
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        self.url = f"http://127.0.0.1:{port}"
+
+    async def async_stop(self):
+        """Stop serving."""
+        await self._runner.cleanup()
+
+    def _record(self, request):
+        """Record a request and the client port it arrived from."""
+        self.requests.append(
+            Request(
+                request.method,
+                request.path,
+                request.transport.get_extra_info("peername")[1],
+                request.headers.get("User-Agent", ""),
+            )
+        )
+
+    async def _handle_site_list(self, request):
+        """Serve the site list."""
+        self._record(request)
+        return web.Response(
+            body=read_fixture("site_list_en.csv"), content_type="text/csv"
+        )
+
+    async def _handle(self, request):
+        """Serve a document, or 304 if the client's copy is current."""
+        self._record(request)
+        if self.errors:
+            return web.Response(status=self.errors.pop(0))
+        key = (
+            f"{request.match_info['province']}/{request.match_info['site']}",
+            request.match_info["language"],
+        )
+        if key not in self.documents:
+            raise web.HTTPNotFound()
+        document = self.documents[key]
+        etag = f'"{hashlib.sha1(document).hexdigest()[:16]}"'
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304, headers={"ETag": etag})
+        return web.Response(
+            body=document, content_type="text/xml", headers={"ETag": etag}
+        )
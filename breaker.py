@@ -0,0 +1,96 @@
+"""Per-host circuit breakers for Environment Canada endpoints."""
+import logging
+import time
+
+from .const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+DATA_BREAKERS = "breakers"
+
+FAILURE_THRESHOLD = 3
+OPEN_TIMEOUT = 60
+MAX_OPEN_TIMEOUT = 15 * 60
+HALF_OPEN_PROBES = 1
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+
+def get_breaker(hass, host):
+    """Return the shared circuit breaker for a host."""
+    breakers = hass.data.setdefault(DOMAIN, {}).setdefault(DATA_BREAKERS, {})
+    if host not in breakers:
+        breakers[host] = CircuitBreaker(host)
+    return breakers[host]
+
+
+class CircuitBreaker:
+    """Stop calling a host after repeated failures, then probe it sparingly.
+
+    After FAILURE_THRESHOLD failures in a row the breaker opens and every
+    request fails fast. Once the open timeout passes, a few probe requests
+    are let through: a success closes the breaker, and a failure reopens
+    it for twice as long.
+    """
+
+    def __init__(self, host):
+        """Initialize a closed breaker."""
+        self.host = host
+        self.state = STATE_CLOSED
+        self._failures = 0
+        self._timeout = OPEN_TIMEOUT
+        self._opened = None
+        self._probes = 0
+
+    def allow(self):
+        """Return whether a request may be made now."""
+        if self.state == STATE_OPEN:
+            if time.monotonic() - self._opened < self._timeout:
+                return False
+            self.state = STATE_HALF_OPEN
+            self._opened = time.monotonic()
+            self._probes = 0
+        if self.state == STATE_HALF_OPEN:
+            if self._probes >= HALF_OPEN_PROBES:
+                # Let another probe through if the last never finished
+                if time.monotonic() - self._opened < self._timeout:
+                    return False
+                self._opened = time.monotonic()
+                self._probes = 0
+            self._probes += 1
+        return True
+
+    def retry_in(self):
+        """Return the seconds until a request will next be allowed."""
+        if self.state == STATE_CLOSED or (
+            self.state == STATE_HALF_OPEN and self._probes < HALF_OPEN_PROBES
+        ):
+            return 0
+        return max(0, self._timeout - (time.monotonic() - self._opened))
+
+    def success(self):
+        """Record a successful request."""
+        if self.state != STATE_CLOSED:
+            _LOGGER.info("%s is responding again", self.host)
+        self.state = STATE_CLOSED
+        self._failures = 0
+        self._timeout = OPEN_TIMEOUT
+
+    def failure(self):
+        """Record a failed request."""
+        self._failures += 1
+        if self.state == STATE_HALF_OPEN:
+            self._timeout = min(self._timeout * 2, MAX_OPEN_TIMEOUT)
+        elif self.state == STATE_OPEN or self._failures < FAILURE_THRESHOLD:
+            return
+        else:
+            _LOGGER.warning(
+                "%s failed %d times in a row, pausing requests for %d seconds",
+                self.host,
+                self._failures,
+                self._timeout,
+            )
+        self.state = STATE_OPEN
+        self._opened = time.monotonic()
@@ -1,7 +1,4 @@
 """Support for the Environment Canada radar imagery."""
-import datetime
-
-from env_canada import ECRadar
 import voluptuous as vol
 
 from homeassistant.components.camera import PLATFORM_SCHEMA, Camera
@@ -10,26 +7,45 @@ from homeassistant.const import (
     CONF_LATITUDE,
     CONF_LONGITUDE,
     CONF_NAME,
+    CONF_PLATFORM,
+    CONF_UNIQUE_ID,
 )
 import homeassistant.helpers.config_validation as cv
-from homeassistant.util import Throttle
+import homeassistant.util.dt as dt
 
-from .const import ATTRIBUTION
+from .const import ATTRIBUTION, DOMAIN
+from .radar import CONTENT_TYPES, MAX_LOOP_FRAMES, get_radar_data
 
+ATTR_IMAGE_AGE = "image_age"
+ATTR_STALE = "stale"
 ATTR_UPDATED = "updated"
 
+CONF_FORMAT = "format"
 CONF_LOOP = "loop"
+CONF_LOOP_FRAMES = "loop_frames"
 CONF_PRECIP_TYPE = "precip_type"
+CONF_RESOLUTION = "resolution"
+CONF_THUMBNAIL = "thumbnail"
 
-MIN_TIME_BETWEEN_UPDATES = datetime.timedelta(minutes=10)
+RESOLUTION_SCALES = {"full": 1, "medium": 2, "small": 4}
+THUMBNAIL_SCALE = 4
 
 PLATFORM_SCHEMA = PLATFORM_SCHEMA.extend(
     {
         vol.Optional(CONF_LOOP, default=True): cv.boolean,
+        vol.Optional(CONF_LOOP_FRAMES): vol.All(
+            vol.Coerce(int), vol.Range(min=2, max=MAX_LOOP_FRAMES)
+        ),
         vol.Optional(CONF_NAME): cv.string,
+        vol.Optional(CONF_UNIQUE_ID): cv.string,
         vol.Inclusive(CONF_LATITUDE, "latlon"): cv.latitude,
         vol.Inclusive(CONF_LONGITUDE, "latlon"): cv.longitude,
         vol.Optional(CONF_PRECIP_TYPE): vol.In(["rain", "snow"]),
+        vol.Optional(CONF_FORMAT, default="gif"): vol.In(list(CONTENT_TYPES)),
+        vol.Optional(CONF_RESOLUTION, default="full"): vol.In(
+            list(RESOLUTION_SCALES)
+        ),
+        vol.Optional(CONF_THUMBNAIL, default=False): cv.boolean,
     }
 )
 
@@ -39,33 +55,83 @@ async def async_setup_platform(hass, config, async_add_entities, discovery_info=
 
     lat = config.get(CONF_LATITUDE, hass.config.latitude)
     lon = config.get(CONF_LONGITUDE, hass.config.longitude)
-    radar_object = ECRadar(
-        coordinates=(lat, lon), precip_type=config.get(CONF_PRECIP_TYPE)
-    )
+    radar_data = get_radar_data(hass, (lat, lon), config.get(CONF_PRECIP_TYPE))
+
+    image_format = config[CONF_FORMAT]
+    scale = RESOLUTION_SCALES[config[CONF_RESOLUTION]]
+    frame_count = config.get(CONF_LOOP_FRAMES)
+    if config[CONF_THUMBNAIL]:
+        frame_count, scale, image_format = 1, THUMBNAIL_SCALE, "png"
+    elif not config[CONF_LOOP] or image_format == "png":
+        frame_count = 1
+
+    # Serve the last saved images until the first refresh completes
+    await radar_data.async_restore()
 
     async_add_entities(
-        [ECCamera(radar_object, config.get(CONF_NAME), config[CONF_LOOP])], True
+        [
+            ECCamera(
+                radar_data,
+                config.get(CONF_NAME),
+                config.get(CONF_UNIQUE_ID),
+                frame_count,
+                scale,
+                image_format,
+            )
+        ],
+        radar_data.image_time is None,
     )
 
 
+async def async_setup_entry(hass, entry, async_add_entities):
+    """Set up the Environment Canada camera from a config entry."""
+    config = PLATFORM_SCHEMA(
+        {
+            CONF_PLATFORM: DOMAIN,
+            CONF_UNIQUE_ID: f"{entry.unique_id}-radar",
+            CONF_LATITUDE: entry.data[CONF_LATITUDE],
+            CONF_LONGITUDE: entry.data[CONF_LONGITUDE],
+        }
+    )
+    await async_setup_platform(hass, config, async_add_entities)
+
+
 class ECCamera(Camera):
     """Implementation of an Environment Canada radar camera."""
 
-    def __init__(self, radar_object, camera_name, is_loop):
+    def __init__(
+        self, radar_data, camera_name, unique_id, frame_count, scale, image_format
+    ):
         """Initialize the camera."""
         super().__init__()
 
-        self.radar_object = radar_object
+        self.radar_data = radar_data
         self.camera_name = camera_name
-        self.is_loop = is_loop
-        self.content_type = "image/gif"
-        self.image = None
-        self.timestamp = None
+        self._unique_id = unique_id
+        self.frame_count = frame_count
+        self.scale = scale
+        self.image_format = image_format
+        self.content_type = CONTENT_TYPES[image_format]
+
+        if frame_count == 1:
+            radar_data.still_enabled = True
+        else:
+            radar_data.loop_enabled = True
 
     async def async_camera_image(self):
-        """Return bytes of camera image."""
-        await self.async_update()
-        return self.image
+        """Return bytes of camera image, refreshing it in the background."""
+        if self.radar_data.image_time is None:
+            await self.async_update()
+        elif self.radar_data.is_expired() and not self.radar_data.updating:
+            self.hass.async_create_task(self.async_update())
+        return await self.radar_data.async_get_image(
+            self.frame_count, self.scale, self.image_format
+        )
+
+    @property
+    def unique_id(self):
+        """Return the unique ID, if one was configured."""
+        return self._unique_id
 
     @property
     def name(self):
@@ -77,13 +143,19 @@ class ECCamera(Camera):
     @property
     def extra_state_attributes(self):
         """Return the state attributes of the device."""
-        return {ATTR_ATTRIBUTION: ATTRIBUTION, ATTR_UPDATED: self.timestamp}
+        image_age = None
+        if self.radar_data.image_time is not None:
+            image_age = int(
+                (dt.utcnow() - self.radar_data.image_time).total_seconds()
+            )
+        return {
+            ATTR_ATTRIBUTION: ATTRIBUTION,
+            ATTR_UPDATED: self.radar_data.timestamp,
+            ATTR_IMAGE_AGE: image_age,
+            ATTR_STALE: self.radar_data.stale,
+            **self.radar_data.timings.summary(),
+        }
 
-    @Throttle(MIN_TIME_BETWEEN_UPDATES)
     async def async_update(self):
         """Update radar image."""
-        if self.is_loop:
-            self.image = await self.radar_object.get_loop()
-        else:
-            self.image = await self.radar_object.get_latest_frame()
-        self.timestamp = self.radar_object.timestamp
+        await self.radar_data.async_update()
@@ -0,0 +1,102 @@
+"""Config flow for the Environment Canada integration."""
+import voluptuous as vol
+
+from homeassistant import config_entries
+from homeassistant.const import CONF_LATITUDE, CONF_LONGITUDE
+from homeassistant.core import callback
+import homeassistant.helpers.config_validation as cv
+
+from .const import DOMAIN
+from .sensor import CONF_LANGUAGE, CONF_STATION, LANGUAGE_BOTH, LANGUAGES
+from .stations import async_get_station_index, validate_station
+
+
+class ECConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
+    """Set up a station once, storing everything needed at startup."""
+
+    VERSION = 1
+
+    @staticmethod
+    @callback
+    def async_get_options_flow(config_entry):
+        """Return the options flow for a configured station."""
+        return ECOptionsFlow(config_entry)
+
+    async def async_step_user(self, user_input=None):
+        """Resolve the station for a location, or check the one given."""
+        errors = {}
+
+        if user_input is not None:
+            lat = user_input[CONF_LATITUDE]
+            lon = user_input[CONF_LONGITUDE]
+            language = user_input[CONF_LANGUAGE]
+
+            try:
+                station = validate_station(user_input.get(CONF_STATION))
+            except vol.Invalid:
+                errors[CONF_STATION] = "bad_station_id"
+            else:
+                title = station
+                if station is None:
+                    index = await async_get_station_index(self.hass)
+                    if index is None:
+                        errors["base"] = "cannot_connect"
+                    else:
+                        nearest = index.nearest(lat, lon)[0]
+                        station, title = nearest.station_id, nearest.name
+
+            if not errors:
+                await self.async_set_unique_id(station)
+                self._abort_if_unique_id_configured()
+                return self.async_create_entry(
+                    title=title,
+                    data={
+                        CONF_STATION: station,
+                        CONF_LANGUAGE: language,
+                        CONF_LATITUDE: lat,
+                        CONF_LONGITUDE: lon,
+                    },
+                )
+
+        data_schema = vol.Schema(
+            {
+                vol.Optional(CONF_STATION): str,
+                vol.Required(
+                    CONF_LATITUDE, default=self.hass.config.latitude
+                ): cv.latitude,
+                vol.Required(
+                    CONF_LONGITUDE, default=self.hass.config.longitude
+                ): cv.longitude,
+                vol.Required(CONF_LANGUAGE, default="english"): vol.In(
+                    [*LANGUAGES, LANGUAGE_BOTH]
+                ),
+            }
+        )
+        return self.async_show_form(
+            step_id="user", data_schema=data_schema, errors=errors
+        )
+
+
+class ECOptionsFlow(config_entries.OptionsFlow):
+    """Change the language of a configured station."""
+
+    def __init__(self, config_entry):
+        """Initialize the options flow."""
+        self.config_entry = config_entry
+
+    async def async_step_init(self, user_input=None):
+        """Choose the sensor language."""
+        if user_input is not None:
+            return self.async_create_entry(title="", data=user_input)
+
+        language = self.config_entry.options.get(
+            CONF_LANGUAGE, self.config_entry.data[CONF_LANGUAGE]
+        )
+        data_schema = vol.Schema(
+            {
+                vol.Required(CONF_LANGUAGE, default=language): vol.In(
+                    [*LANGUAGES, LANGUAGE_BOTH]
+                ),
+            }
+        )
+        return self.async_show_form(step_id="init", data_schema=data_schema)
@@ -53,6 +53,15 @@ ICON_CONDITION_MAP = {
     ATTR_CONDITION_HAIL: [26, 27],
 }
 
+# Icon code to condition index, built once at import. Codes 26 and 27 are
+# listed under both snow and hail; the first entry in ICON_CONDITION_MAP
+# wins, so 26 is snowy and 27 is snowy-rainy.
+ICON_CODE_TO_CONDITION = {}
+for _condition, _codes in ICON_CONDITION_MAP.items():
+    for _code in _codes:
+        ICON_CODE_TO_CONDITION.setdefault(_code, _condition)
+del _condition, _codes, _code
+
 SENSOR_TYPES = {
     "temperature": {
         ATTR_DEVICE_CLASS: DEVICE_CLASS_TEMPERATURE,
@@ -0,0 +1,175 @@
+"""Forecast structures built incrementally from Environment Canada data."""
+import bisect
+import datetime
+from typing import NamedTuple, Optional
+
+from homeassistant.components.weather import (
+    ATTR_FORECAST_CONDITION,
+    ATTR_FORECAST_PRECIPITATION_PROBABILITY,
+    ATTR_FORECAST_TEMP,
+    ATTR_FORECAST_TEMP_LOW,
+    ATTR_FORECAST_TIME,
+)
+import homeassistant.util.dt as dt
+
+from .const import ICON_CODE_TO_CONDITION
+
+# Environment Canada publishes forecasts for today and the next six days
+MAX_FORECAST_DAYS = 7
+
+
+class DailyForecast(NamedTuple):
+    """One day of the daily forecast, built from its day and night periods."""
+
+    time: datetime.datetime
+    temperature: Optional[int]
+    temperature_low: Optional[int]
+    condition: Optional[str]
+    precip_probability: Optional[int]
+
+    def as_dict(self):
+        """Return the day in the weather entity's forecast format."""
+        return {
+            ATTR_FORECAST_TIME: self.time.isoformat(),
+            ATTR_FORECAST_TEMP: self.temperature,
+            ATTR_FORECAST_TEMP_LOW: self.temperature_low,
+            ATTR_FORECAST_CONDITION: self.condition,
+            ATTR_FORECAST_PRECIPITATION_PROBABILITY: self.precip_probability,
+        }
+
+
+def build_daily_forecast(half_days, days=MAX_FORECAST_DAYS, now=None):
+    """Pair day and night periods into at most the given number of days.
+
+    A day period starts a new day, and the night period after it gives
+    that day's low. A night with no day before it, as when the forecast
+    is issued in the evening, is a day of its own with no high, and a day
+    with no night after it has no low.
+    """
+    now = now or dt.now()
+    pairs = []
+    day = None
+    for half_day in half_days:
+        if half_day.get("temperature_class") == "high":
+            if day is not None:
+                pairs.append((day, None))
+            day = half_day
+        else:
+            pairs.append((day, half_day))
+            day = None
+        if len(pairs) >= days:
+            break
+    if day is not None and len(pairs) < days:
+        pairs.append((day, None))
+
+    forecast = []
+    for offset, (day, night) in enumerate(pairs):
+        summary = day or night
+        forecast.append(
+            DailyForecast(
+                time=now + datetime.timedelta(days=offset),
+                temperature=_to_int(day and day.get("temperature")),
+                temperature_low=_to_int(night and night.get("temperature")),
+                condition=ICON_CODE_TO_CONDITION.get(
+                    _to_int(summary.get("icon_code"))
+                ),
+                precip_probability=_to_int(summary.get("precip_probability")),
+            )
+        )
+    return forecast
+
+
+def _to_int(value):
+    """Return a parsed number as an integer, or None if it is missing."""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class HourlyForecastStore:
+    """Rolling hourly forecasts, indexed by time and updated in place.
+
+    Each update parses only periods it has not seen before, rebuilds only
+    the hours whose values changed, and drops hours that have passed or
+    that the feed no longer lists.
+    """
+
+    def __init__(self):
+        """Initialize an empty store."""
+        self._periods = {}
+        self._raw = {}
+        self._hours = {}
+        self._times = []
+        self._forecast = []
+
+    def update(self, hourly_forecasts, now=None):
+        """Merge the latest hourly forecasts into the store."""
+        current_hour = _start_of_hour(now or dt.utcnow())
+        changed = False
+        listed = set()
+
+        for hour in hourly_forecasts:
+            period = hour["period"]
+            time = self._periods.get(period)
+            if time is None:
+                time = _parse_period(period)
+                self._periods[period] = time
+            if time < current_hour:
+                continue
+
+            listed.add(time)
+            raw = (hour["temperature"], hour["icon_code"], hour["precip_probability"])
+            if self._raw.get(time) == raw:
+                continue
+            self._raw[time] = raw
+            self._hours[time] = {
+                ATTR_FORECAST_TIME: time.isoformat(),
+                ATTR_FORECAST_TEMP: int(hour["temperature"]),
+                ATTR_FORECAST_CONDITION: ICON_CODE_TO_CONDITION.get(
+                    int(hour["icon_code"])
+                ),
+                ATTR_FORECAST_PRECIPITATION_PROBABILITY: int(
+                    hour["precip_probability"]
+                ),
+            }
+            changed = True
+
+        dropped = [time for time in self._hours if time not in listed]
+        for time in dropped:
+            del self._raw[time]
+            del self._hours[time]
+        if dropped:
+            self._periods = {
+                period: time for period, time in self._periods.items() if time in listed
+            }
+            changed = True
+
+        if changed:
+            self._times = sorted(self._hours)
+            self._forecast = [self._hours[time] for time in self._times]
+
+    def window(self, hours=None, now=None):
+        """Return the forecasts from the current hour, up to a horizon."""
+        start = bisect.bisect_left(self._times, _start_of_hour(now or dt.utcnow()))
+        end = None if hours is None else start + hours
+        return self._forecast[start:end]
+
+
+def _parse_period(period):
+    """Return an hourly period as a UTC datetime.
+
+    env_canada gives periods as datetimes; periods restored from the cache
+    are ISO strings, and older feeds used compact UTC timestamps.
+    """
+    if isinstance(period, datetime.datetime):
+        return dt.as_utc(period)
+    parsed = dt.parse_datetime(period)
+    if parsed is not None:
+        return dt.as_utc(parsed)
+    return datetime.datetime.strptime(period, "%Y%m%d%H%M").replace(tzinfo=dt.UTC)
+
+
+def _start_of_hour(moment):
+    """Return the start of the hour containing a moment."""
+    return moment.replace(minute=0, second=0, microsecond=0)
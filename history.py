@@ -0,0 +1,323 @@
+"""Compact on-disk history of station observations."""
+import asyncio
+import logging
+import mmap
+import os
+import struct
+
+import voluptuous as vol
+
+from homeassistant.components import websocket_api
+from homeassistant.core import callback
+import homeassistant.helpers.config_validation as cv
+from homeassistant.helpers.storage import STORAGE_DIR
+import homeassistant.util.dt as dt
+
+from .const import DOMAIN
+from .stations import validate_station
+
+_LOGGER = logging.getLogger(__name__)
+
+DATA_HISTORY = "history"
+
+HISTORY_FIELDS = (
+    "temperature",
+    "pressure",
+    "humidity",
+    "wind_speed",
+    "precip_yesterday",
+)
+
+# About a year of hourly observations per chunk file
+CHUNK_ROWS = 8760
+HOUR = 3600
+
+# Observation time (epoch seconds) and value
+SAMPLE = struct.Struct("<If")
+# Hour start (epoch seconds), minimum, maximum, mean and sample count
+ROLLUP = struct.Struct("<IfffI")
+
+
+@callback
+def async_setup_history(hass):
+    """Register the history query command."""
+    websocket_api.async_register_command(hass, websocket_history)
+
+
+async def async_get_history(hass):
+    """Return the shared history store, creating it on first use."""
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    if DATA_HISTORY not in domain_data:
+        domain_data[DATA_HISTORY] = ECHistory(
+            hass, hass.config.path(STORAGE_DIR, DOMAIN, "history")
+        )
+    return domain_data[DATA_HISTORY]
+
+
+class ECHistory:
+    """Observation history for every station, one series per field.
+
+    Series are opened on first use and all file access runs in the
+    executor, one job at a time.
+    """
+
+    def __init__(self, hass, path):
+        """Initialize the store."""
+        self.hass = hass
+        self.path = path
+        self._series = {}
+        self._lock = asyncio.Lock()
+
+    async def async_record(self, station_id, observed, values):
+        """Append a station's observed values, skipping any already stored."""
+        time = int(observed.timestamp())
+        samples = {}
+        for field in HISTORY_FIELDS:
+            try:
+                samples[field] = float(values.get(field))
+            except (TypeError, ValueError):
+                continue
+        if not samples:
+            return
+        async with self._lock:
+            await self.hass.async_add_executor_job(
+                self._record, station_id, time, samples
+            )
+
+    async def async_query(self, station_id, field, start, end, hourly=True):
+        """Return a series' samples or hourly rollups, and their summary."""
+        async with self._lock:
+            return await self.hass.async_add_executor_job(
+                self._query,
+                station_id,
+                field,
+                int(start.timestamp()),
+                int(end.timestamp()),
+                hourly,
+            )
+
+    def _get_series(self, station_id, field, create=True):
+        """Return a series, opening it if needed.
+
+        Without create, a series that has never been recorded is None
+        rather than a new, empty directory.
+        """
+        key = (station_id, field)
+        if key not in self._series:
+            path = os.path.join(self.path, station_id.replace("/", "_"), field)
+            if not create and not os.path.isdir(path):
+                return None
+            self._series[key] = HistorySeries(path)
+        return self._series[key]
+
+    def _record(self, station_id, time, samples):
+        """Append samples to their series."""
+        for field, value in samples.items():
+            try:
+                self._get_series(station_id, field).append(time, value)
+            except OSError as err:
+                _LOGGER.warning("Error recording %s history: %s", station_id, err)
+                return
+
+    def _query(self, station_id, field, start, end, hourly):
+        """Read a range from a series."""
+        series = self._get_series(station_id, field, create=False)
+        if series is None:
+            return {"points": [], "summary": summarize([])}
+        rollups = series.rollups(start, end)
+        if hourly:
+            points = [
+                {"time": time, "min": low, "max": high, "mean": mean}
+                for time, low, high, mean, _ in rollups
+            ]
+        else:
+            points = [
+                {"time": time, "value": value}
+                for time, value in series.samples(start, end)
+            ]
+        return {"points": points, "summary": summarize(rollups)}
+
+
+class HistorySeries:
+    """Append-only samples of one field at one station, with hourly rollups.
+
+    Samples are fixed-width records in chunk files named after their first
+    observation time. Each hour is rolled up into its own file once a
+    sample from a later hour arrives. Reads map the files into memory and
+    binary search them, so a range costs the same however long the
+    history grows.
+    """
+
+    def __init__(self, path):
+        """Open a series directory, creating it if needed."""
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._chunks = sorted(
+            int(name.split(".")[0])
+            for name in os.listdir(path)
+            if name.endswith(".samples")
+        )
+        self._rollups_path = os.path.join(path, "hourly.rollups")
+        self.last_time = None
+        self._hour = None
+
+        if self._chunks:
+            with open(self._chunk_path(self._chunks[-1]), "rb") as chunk:
+                data = chunk.read()
+            samples = list(SAMPLE.iter_unpack(data[: _whole(len(data), SAMPLE)]))
+            if samples:
+                self.last_time = samples[-1][0]
+                self._restore_hour(samples)
+
+    def _chunk_path(self, start):
+        """Return the path of the chunk starting at a time."""
+        return os.path.join(self.path, f"{start}.samples")
+
+    def _restore_hour(self, samples):
+        """Rebuild the open hour from samples not yet rolled up."""
+        hour = _hour(self.last_time)
+        rolled = _read_records(self._rollups_path, ROLLUP, hour, hour + 1)
+        if rolled:
+            return
+        for time, value in samples:
+            if _hour(time) == hour:
+                self._add_to_hour(hour, value)
+
+    def _add_to_hour(self, hour, value):
+        """Add a value to the open hour's rollup."""
+        if self._hour is None:
+            self._hour = [hour, value, value, 0.0, 0]
+        self._hour[1] = min(self._hour[1], value)
+        self._hour[2] = max(self._hour[2], value)
+        self._hour[3] += value
+        self._hour[4] += 1
+
+    def append(self, time, value):
+        """Append a sample, ignoring any not newer than the last one."""
+        if self.last_time is not None and time <= self.last_time:
+            return False
+
+        if not self._chunks or self._chunk_rows() >= CHUNK_ROWS:
+            self._chunks.append(time)
+        with open(self._chunk_path(self._chunks[-1]), "ab") as chunk:
+            chunk.write(SAMPLE.pack(time, value))
+        self.last_time = time
+
+        hour = _hour(time)
+        if self._hour is not None and self._hour[0] != hour:
+            with open(self._rollups_path, "ab") as rollups:
+                rollups.write(ROLLUP.pack(*_close_hour(self._hour)))
+            self._hour = None
+        self._add_to_hour(hour, value)
+        return True
+
+    def _chunk_rows(self):
+        """Return the number of samples in the newest chunk."""
+        return os.path.getsize(self._chunk_path(self._chunks[-1])) // SAMPLE.size
+
+    def samples(self, start, end):
+        """Return the (time, value) samples observed in [start, end)."""
+        samples = []
+        for index, chunk_start in enumerate(self._chunks):
+            following = self._chunks[index + 1 : index + 2]
+            if chunk_start >= end or (following and following[0] <= start):
+                continue
+            samples.extend(
+                _read_records(self._chunk_path(chunk_start), SAMPLE, start, end)
+            )
+        return samples
+
+    def rollups(self, start, end):
+        """Return the hourly rollups for hours starting in [start, end)."""
+        rollups = _read_records(self._rollups_path, ROLLUP, _hour(start), end)
+        if self._hour is not None and _hour(start) <= self._hour[0] < end:
+            rollups.append(_close_hour(self._hour))
+        return rollups
+
+
+def summarize(rollups):
+    """Return the minimum, maximum and mean across hourly rollups."""
+    count = sum(rollup[4] for rollup in rollups)
+    if not count:
+        return {"min": None, "max": None, "mean": None, "count": 0}
+    return {
+        "min": min(rollup[1] for rollup in rollups),
+        "max": max(rollup[2] for rollup in rollups),
+        "mean": sum(rollup[3] * rollup[4] for rollup in rollups) / count,
+        "count": count,
+    }
+
+
+def _hour(time):
+    """Return the start of the hour containing an epoch time."""
+    return time - time % HOUR
+
+
+def _close_hour(hour):
+    """Return an open hour's accumulator as a rollup record."""
+    start, low, high, total, count = hour
+    return (start, low, high, total / count, count)
+
+
+def _whole(size, record):
+    """Return a byte length rounded down to whole records."""
+    return size - size % record.size
+
+
+def _read_records(path, record, start, end):
+    """Return the records of a time-ordered file with times in [start, end)."""
+    try:
+        with open(path, "rb") as records:
+            size = _whole(os.fstat(records.fileno()).st_size, record)
+            if not size:
+                return []
+            with mmap.mmap(records.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                rows = size // record.size
+
+                def time_at(row):
+                    return record.unpack_from(view, row * record.size)[0]
+
+                low, high = 0, rows
+                while low < high:
+                    middle = (low + high) // 2
+                    if time_at(middle) < start:
+                        low = middle + 1
+                    else:
+                        high = middle
+
+                found = []
+                for row in range(low, rows):
+                    values = record.unpack_from(view, row * record.size)
+                    if values[0] >= end:
+                        break
+                    found.append(values)
+                return found
+    except FileNotFoundError:
+        return []
+
+
+@websocket_api.websocket_command(
+    {
+        vol.Required("type"): "environment_canada/history",
+        vol.Required("station"): vol.All(cv.string, validate_station),
+        vol.Required("field"): vol.In(HISTORY_FIELDS),
+        vol.Required("start_time"): str,
+        vol.Optional("end_time"): str,
+        vol.Optional("hourly", default=True): bool,
+    }
+)
+@websocket_api.async_response
+async def websocket_history(hass, connection, msg):
+    """Return a station's stored history for a field."""
+    start = dt.parse_datetime(msg["start_time"])
+    end = dt.parse_datetime(msg["end_time"]) if "end_time" in msg else dt.utcnow()
+    if start is None or end is None:
+        connection.send_error(msg["id"], "invalid_time", "Invalid time")
+        return
+    start, end = dt.as_utc(start), dt.as_utc(end)
+
+    history = await async_get_history(hass)
+    result = await history.async_query(
+        msg["station"], msg["field"], start, end, msg["hourly"]
+    )
+    connection.send_result(msg["id"], result)
@@ -0,0 +1,478 @@
+"""Shared radar imagery for Environment Canada cameras."""
+import asyncio
+from collections import OrderedDict
+import datetime
+import io
+import logging
+import struct
+
+from aiohttp import ClientError
+import async_timeout
+from env_canada import ECRadar
+from PIL import Image, ImageChops, ImageSequence
+
+import homeassistant.util.dt as dt
+
+from .breaker import get_breaker
+from .const import DOMAIN
+from .schedule import PublishSchedule
+from .storage import async_get_cache
+from .timing import Timings
+
+_LOGGER = logging.getLogger(__name__)
+
+DATA_RADAR = "radar"
+DATA_RADAR_FRAMES = "radar_frames"
+
+RADAR_HOST = "geo.weather.gc.ca"
+RADAR_TIMEOUT = 30
+
+MIN_UPDATE_INTERVAL = datetime.timedelta(minutes=2)
+MAX_UPDATE_INTERVAL = datetime.timedelta(minutes=30)
+
+FRAME_INTERVAL = datetime.timedelta(minutes=10)
+FRAME_DURATION = 200
+MAX_LOOP_FRAMES = 24
+MAX_CACHE_BYTES = 32 * 1024 * 1024
+
+CONTENT_TYPES = {"gif": "image/gif", "png": "image/png", "webp": "image/webp"}
+
+# Application extension making a GIF loop forever
+GIF_LOOP_FOREVER = b"\x21\xff\x0bNETSCAPE2.0\x03\x01\x00\x00\x00"
+
+# Coordinates are rounded so cameras a few hundred metres apart share a map
+COORDINATE_PRECISION = 2
+
+
+def get_radar_data(hass, coordinates, precip_type):
+    """Return the shared radar data for a layer and map area."""
+    lat, lon = (round(coord, COORDINATE_PRECISION) for coord in coordinates)
+    key = (precip_type, lat, lon)
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    sources = domain_data.setdefault(DATA_RADAR, {})
+    frames = domain_data.setdefault(
+        DATA_RADAR_FRAMES, RadarFrameCache(MAX_CACHE_BYTES)
+    )
+
+    if key not in sources:
+        radar_object = ECRadar(coordinates=(lat, lon), precip_type=precip_type)
+        sources[key] = ECRadarData(hass, radar_object, key, frames)
+
+    return sources[key]
+
+
+class ECRadarData:
+    """Radar images for one layer and map area, shared by every camera on it."""
+
+    def __init__(self, hass, radar_object, key, frames):
+        """Initialize the shared radar data."""
+        self.hass = hass
+        self.radar_object = radar_object
+        self.key = key
+        self.frames = frames
+        self.loop_enabled = False
+        self.still_enabled = False
+        self.loop_image = None
+        self.latest_image = None
+        self.timestamp = None
+        self.image_time = None
+        self.next_update = None
+        self.stale = False
+        self.schedule = PublishSchedule(
+            FRAME_INTERVAL, MIN_UPDATE_INTERVAL, MAX_UPDATE_INTERVAL
+        )
+        self.timings = Timings()
+        self._loop_times = []
+        self._loop_guessed = False
+        self._encoded = {}
+        self._latest_frame = None
+        self._renders = {}
+        self._cache = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def updating(self):
+        """Return whether a refresh is in progress."""
+        return self._lock.locked()
+
+    @property
+    def cache_name(self):
+        """Return the name this source's images are cached under."""
+        precip_type, lat, lon = self.key
+        return f"radar_{precip_type or 'auto'}_{lat}_{lon}"
+
+    async def async_restore(self):
+        """Restore the last images saved for this source."""
+        async with self._lock:
+            if self._cache is not None:
+                return
+            self._cache = await async_get_cache(self.hass)
+            cached = self._cache.get(self.cache_name)
+            if not cached:
+                return
+
+            self.loop_image = await self._cache.async_load_file(
+                f"{self.cache_name}.loop"
+            )
+            self.latest_image = await self._cache.async_load_file(
+                f"{self.cache_name}.latest"
+            )
+            self.timestamp = cached["timestamp"]
+            if isinstance(self.timestamp, str):
+                self.timestamp = dt.parse_datetime(self.timestamp) or self.timestamp
+            self.image_time = dt.parse_datetime(cached["image_time"])
+
+    async def _async_save(self):
+        """Save the current images to the cache."""
+        if self._cache is None:
+            return
+        if self.loop_image is not None:
+            await self._cache.async_save_file(
+                f"{self.cache_name}.loop", self.loop_image
+            )
+        if self.latest_image is not None:
+            await self._cache.async_save_file(
+                f"{self.cache_name}.latest", self.latest_image
+            )
+        self._cache.set(
+            self.cache_name,
+            {"timestamp": self.timestamp, "image_time": self.image_time.isoformat()},
+        )
+
+    def is_expired(self):
+        """Return whether the cached images are due for a refresh."""
+        return self.next_update is None or dt.utcnow() >= self.next_update
+
+    async def async_update(self):
+        """Update radar images, unless another caller is already doing so.
+
+        While the radar host is failing, the last images are kept and
+        marked stale.
+        """
+        async with self._lock:
+            if not self.is_expired():
+                return
+            breaker = get_breaker(self.hass, RADAR_HOST)
+            if not breaker.allow():
+                self.stale = True
+                return
+            self._latest_frame = None
+            self._renders = {}
+            loop_cached = self._loop_is_cached()
+            if self.loop_enabled:
+                self.timings.hit("loop_frames", loop_cached)
+            try:
+                async with async_timeout.timeout(RADAR_TIMEOUT):
+                    with self.timings.span("update"):
+                        await self._async_download(loop_cached)
+            except (asyncio.TimeoutError, ClientError) as err:
+                _LOGGER.debug("Error fetching radar images: %s", err)
+                breaker.failure()
+                self.stale = True
+                return
+            breaker.success()
+            self.stale = False
+            images = {"loop": self.loop_image, "latest": self.latest_image}
+            for name, image in images.items():
+                if image is not None:
+                    self.timings.size(name, len(image))
+            self.timestamp = self.radar_object.timestamp
+            self.image_time = dt.utcnow()
+            self.schedule.record(self._frame_time() or self.timestamp, self.image_time)
+            self.next_update = self.image_time + self.schedule.next_interval(
+                self.image_time
+            )
+            await self._async_save()
+
+    async def _async_download(self, loop_cached):
+        """Download the images the cameras on this source need."""
+        if self.loop_enabled and not loop_cached:
+            await self._async_load_loop()
+            if self.still_enabled:
+                await self._async_load_latest()
+        else:
+            await self._async_load_latest()
+            if self.loop_enabled:
+                await self._async_extend_loop()
+
+    def _frame_time(self):
+        """Return the published time of the radar's latest frame, if known."""
+        timestamp = self.radar_object.timestamp
+        if isinstance(timestamp, str):
+            timestamp = dt.parse_datetime(timestamp)
+        return timestamp
+
+    def _follows_loop(self, timestamp):
+        """Return whether a frame directly follows the cached loop."""
+        if timestamp is None or self._loop_guessed or not self._loop_times:
+            return False
+        step = min(FRAME_INTERVAL, self.schedule.cadence)
+        return timestamp - self._loop_times[-1] <= step
+
+    def _loop_is_cached(self):
+        """Return whether every frame of the current loop is still cached."""
+        return bool(self._loop_times) and all(
+            (self.key, timestamp) in self.frames for timestamp in self._loop_times
+        )
+
+    async def _async_load_latest(self):
+        """Download the latest frame."""
+        with self.timings.span("download"):
+            self.latest_image = await self.radar_object.get_latest_frame()
+
+    async def _async_load_loop(self):
+        """Download a full loop and seed the frame cache from it."""
+        with self.timings.span("download_loop"):
+            self.loop_image = await self.radar_object.get_loop()
+        with self.timings.span("decode"):
+            frames = await self.hass.async_add_executor_job(
+                decode_loop, self.loop_image
+            )
+        latest = self._frame_time()
+        # Without a published time, the frame times are only a guess
+        self._loop_guessed = latest is None
+        latest = latest or dt.utcnow()
+        self._loop_times = []
+        self._encoded = {}
+        for age, frame in enumerate(reversed(frames[-MAX_LOOP_FRAMES:])):
+            timestamp = latest - age * FRAME_INTERVAL
+            self.frames.add((self.key, timestamp), frame)
+            self._loop_times.insert(0, timestamp)
+
+    async def _async_extend_loop(self):
+        """Add the newest frame to the cached loop, encoding only that frame.
+
+        A frame is only appended if it directly follows the loop's last
+        frame. After missed frames, or when the loop's frame times were
+        guessed, the whole loop is downloaded again so the animation keeps
+        a true timeline. Each frame's encoded image is kept while it is in
+        the loop, as the changes from the frame before it, so the loop is
+        joined from them. Only the first extension after a full download
+        encodes every frame.
+        """
+        timestamp = self._frame_time()
+        if timestamp is not None and timestamp in self._loop_times:
+            return
+        if not self._follows_loop(timestamp):
+            await self._async_load_loop()
+            return
+        frame = await self.hass.async_add_executor_job(decode_frame, self.latest_image)
+        self._latest_frame = frame
+        self.frames.add((self.key, timestamp), frame)
+        self._loop_times = (self._loop_times + [timestamp])[-MAX_LOOP_FRAMES:]
+        if not self._loop_is_cached():
+            await self._async_load_loop()
+            return
+        # The first frame is encoded whole, and each later one as a change
+        needed = [(self._loop_times[0], None)]
+        needed.extend(zip(self._loop_times[1:], self._loop_times))
+        missing = [key for key in needed if key not in self._encoded]
+        with self.timings.span("assemble"):
+            encoded = await self.hass.async_add_executor_job(
+                encode_gif_frames,
+                [
+                    (
+                        self.frames.get((self.key, time)),
+                        None if before is None else self.frames.get((self.key, before)),
+                    )
+                    for time, before in missing
+                ],
+            )
+        self._encoded.update(zip(missing, encoded))
+        self._encoded = {key: self._encoded[key] for key in needed}
+        self.loop_image = join_gif_frames(
+            [self._encoded[key] for key in needed], frame.size
+        )
+
+    async def async_get_image(self, frame_count=None, scale=1, image_format="gif"):
+        """Return the latest frames rendered at a scale and in a format.
+
+        A frame_count of None means the whole cached loop. Full size GIFs
+        are served as downloaded or assembled; other outputs are rendered
+        once per refresh and reused by every camera that asks for them.
+        """
+        if scale == 1 and image_format == "gif":
+            if frame_count is None:
+                return self.loop_image
+            if frame_count == 1:
+                return self.latest_image
+
+        key = (frame_count, scale, image_format)
+        self.timings.hit("render", key in self._renders)
+        if key not in self._renders:
+            frames = await self._async_output_frames(frame_count)
+            if not frames:
+                return None
+            with self.timings.span("render"):
+                self._renders[key] = await self.hass.async_add_executor_job(
+                    render_frames, frames, scale, image_format
+                )
+        return self._renders[key]
+
+    async def _async_output_frames(self, frame_count):
+        """Return the decoded frames to render, oldest first."""
+        if frame_count == 1:
+            if self._latest_frame is None and self.latest_image is not None:
+                self._latest_frame = await self.hass.async_add_executor_job(
+                    decode_frame, self.latest_image
+                )
+            return [self._latest_frame] if self._latest_frame is not None else []
+
+        if not self._loop_times and self.loop_image is not None:
+            # Restored from the cache, before any frames were decoded
+            frames = await self.hass.async_add_executor_job(
+                decode_loop, self.loop_image
+            )
+        else:
+            frames = [
+                self.frames.get((self.key, timestamp))
+                for timestamp in self._loop_times
+                if (self.key, timestamp) in self.frames
+            ]
+        if frame_count is not None:
+            frames = frames[-frame_count:]
+        return frames
+
+
+class RadarFrameCache:
+    """Least recently used cache of decoded radar frames, bounded in bytes."""
+
+    def __init__(self, max_bytes):
+        """Initialize the cache."""
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._frames = OrderedDict()
+
+    def __contains__(self, key):
+        """Return whether a frame is cached."""
+        return key in self._frames
+
+    def get(self, key):
+        """Return a cached frame and mark it as recently used."""
+        self._frames.move_to_end(key)
+        return self._frames[key][0]
+
+    def add(self, key, frame):
+        """Add a frame, evicting the least recently used ones over the limit."""
+        if key in self._frames:
+            self.size -= self._frames.pop(key)[1]
+        size = frame_size(frame)
+        self._frames[key] = (frame, size)
+        self.size += size
+        while self.size > self.max_bytes and len(self._frames) > 1:
+            self.size -= self._frames.popitem(last=False)[1][1]
+
+
+def frame_size(frame):
+    """Return the approximate memory used by a decoded palette frame."""
+    return frame.width * frame.height + 768
+
+
+def decode_frame(image):
+    """Decode a radar image into a palette frame ready for GIF encoding."""
+    return Image.open(io.BytesIO(image)).convert("RGB").quantize()
+
+
+def decode_loop(image):
+    """Decode every frame of an animated radar loop."""
+    loop = Image.open(io.BytesIO(image))
+    return [
+        frame.convert("RGB").quantize() for frame in ImageSequence.Iterator(loop)
+    ]
+
+
+def encode_loop(frames, image_format="gif"):
+    """Assemble decoded frames into an animated image."""
+    output = io.BytesIO()
+    frames[0].save(
+        output,
+        format=image_format.upper(),
+        save_all=True,
+        append_images=frames[1:],
+        duration=FRAME_DURATION,
+        loop=0,
+    )
+    return output.getvalue()
+
+
+def encode_gif_frames(frames):
+    """Encode decoded frames as GIF image blocks, each with its own palette.
+
+    Each frame is given with the frame shown before it, or None, and only
+    the area that differs from that frame is encoded. A block is the
+    area's image descriptor, color table and compressed pixels, so blocks
+    encoded at different times can be joined into a loop.
+    """
+    blocks = []
+    for frame, before in frames:
+        left, top = 0, 0
+        if before is not None:
+            changed = ImageChops.difference(
+                frame.convert("RGB"), before.convert("RGB")
+            ).getbbox()
+            left, top, right, bottom = changed or (0, 0, 1, 1)
+            frame = frame.crop((left, top, right, bottom))
+        output = io.BytesIO()
+        frame.save(output, format="GIF")
+        data = output.getvalue()
+        screen_flags = data[10]
+        position = 13
+        palette = b""
+        if screen_flags & 0x80:
+            palette = data[position : position + _color_table_size(screen_flags)]
+            position += len(palette)
+        while data[position] == 0x21:
+            position = _skip_sub_blocks(data, position + 2)
+        descriptor = bytearray(data[position : position + 10])
+        descriptor[1:5] = struct.pack("<HH", left, top)
+        position += 10
+        if descriptor[9] & 0x80:
+            palette = data[position : position + _color_table_size(descriptor[9])]
+            position += len(palette)
+        else:
+            # Move the global color table in front of this frame alone
+            descriptor[9] |= 0x80 | screen_flags & 0x07
+        end = _skip_sub_blocks(data, position + 1)
+        blocks.append(bytes(descriptor) + palette + data[position:end])
+    return blocks
+
+
+def join_gif_frames(blocks, size, duration=FRAME_DURATION):
+    """Join encoded GIF image blocks into an animated loop."""
+    width, height = size
+    # Show each frame for the duration, in hundredths of a second
+    control = b"\x21\xf9\x04\x04" + struct.pack("<H", duration // 10) + b"\x00\x00"
+    parts = [b"GIF89a", struct.pack("<HHBBB", width, height, 0x70, 0, 0)]
+    parts.append(GIF_LOOP_FOREVER)
+    for block in blocks:
+        parts.append(control)
+        parts.append(block)
+    parts.append(b";")
+    return b"".join(parts)
+
+
+def _color_table_size(flags):
+    """Return the length in bytes of the color table that flags describe."""
+    return 3 * 2 ** ((flags & 0x07) + 1)
+
+
+def _skip_sub_blocks(data, position):
+    """Return the position after a run of GIF data sub-blocks."""
+    while data[position]:
+        position += data[position] + 1
+    return position + 1
+
+
+def render_frames(frames, scale, image_format):
+    """Downscale decoded frames and encode them as a still or a loop."""
+    if scale != 1:
+        frames = [
+            frame.resize((frame.width // scale, frame.height // scale))
+            for frame in frames
+        ]
+
+    if image_format == "png" or len(frames) == 1:
+        output = io.BytesIO()
+        frames[-1].save(output, format=image_format.upper())
+        return output.getvalue()
+    return encode_loop(frames, image_format)
@@ -0,0 +1,63 @@
+"""Polling schedules that follow Environment Canada's publish cadence."""
+from collections import deque
+import datetime
+from statistics import median
+
+# Extra wait after an expected publish, so the new data is in place
+PUBLISH_GRACE = datetime.timedelta(minutes=2)
+
+
+class PublishSchedule:
+    """Predict when a feed will next publish from when it last changed.
+
+    Every poll records the feed's current value. Values that are datetimes
+    are the feed's own publish times; other values are dated to the poll
+    that first saw them. The publish times give the feed's cadence, and
+    the next poll is planned just after the next expected publish. Once a
+    publish is overdue, the wait doubles from the minimum interval on
+    every unchanged poll.
+    """
+
+    def __init__(self, cadence, min_interval, max_interval, history=6):
+        """Initialize the schedule with a default publish cadence."""
+        self.cadence = cadence
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self._value = None
+        self._changes = deque(maxlen=history)
+        self._misses = 0
+
+    def record(self, value, now):
+        """Record the feed's value as seen at a poll."""
+        if self._changes and value == self._value:
+            if now >= self._expected():
+                self._misses += 1
+            return
+
+        self._value = value
+        # Date a change to its publish, so polling is not held at an offset
+        # from the cadence by when it happened to start
+        if isinstance(value, datetime.datetime):
+            self._changes.append(min(value, now))
+        else:
+            self._changes.append(now)
+        self._misses = 0
+        if len(self._changes) > 2:
+            changes = list(self._changes)
+            self.cadence = median(
+                later - earlier for earlier, later in zip(changes, changes[1:])
+            )
+
+    def next_interval(self, now):
+        """Return how long to wait before polling the feed again."""
+        if not self._changes:
+            return self.min_interval
+
+        wait = self._expected() - now
+        if wait <= datetime.timedelta(0):
+            wait = self.min_interval * 2 ** self._misses
+        return max(self.min_interval, min(wait, self.max_interval))
+
+    def _expected(self):
+        """Return when the next publish should be available."""
+        return self._changes[-1] + self.cadence + PUBLISH_GRACE
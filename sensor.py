@@ -1,10 +1,6 @@
 """Support for the Environment Canada weather service."""
-from datetime import datetime, timedelta
 import logging
-import re
 
-import async_timeout
-from env_canada import ECWeather  # pylint: disable=import-error
 import voluptuous as vol
 
 from homeassistant.components.sensor import PLATFORM_SCHEMA, SensorEntity
@@ -14,103 +10,241 @@ from homeassistant.const import (
     ATTR_TIME,
     CONF_LATITUDE,
     CONF_LONGITUDE,
+    CONF_PLATFORM,
+    TIME_MILLISECONDS,
 )
+from homeassistant.core import callback
 import homeassistant.helpers.config_validation as cv
-from homeassistant.helpers.update_coordinator import (
-    CoordinatorEntity,
-    DataUpdateCoordinator,
-)
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
+from . import ECStationsUpdateCoordinator, get_weather_data
+from .alerts import ALERT_PATTERNS
 from .const import (
     ATTRIBUTION,
     ATTR_ICON,
     ATTR_UNIT,
+    DOMAIN,
     SENSOR_TYPES
 )
+from .stations import async_closest_station, validate_station
 
 _LOGGER = logging.getLogger(__name__)
 
 ATTR_UPDATED = "updated"
 ATTR_STATION = "station"
+ATTR_STALE = "stale"
 
 CONF_STATION = "station"
+CONF_STATIONS = "stations"
 CONF_LANGUAGE = "language"
+CONF_DIAGNOSTICS = "diagnostics"
 
+LANGUAGES = ["english", "french"]
+LANGUAGE_BOTH = "both"
 
-def validate_station(station):
-    """Check that the station ID is well-formed."""
-    if station is None:
-        return
-    if not re.fullmatch(r"[A-Z]{2}/s0000\d{3}", station):
-        raise vol.error.Invalid('Station ID must be of the form "XX/s0000###"')
-    return station
+# Sensors whose values are text, so each language gets its own entity
+TEXT_SENSOR_TYPES = {
+    "condition",
+    "text_summary",
+    "tendency",
+    "wind_dir",
+    *ALERT_PATTERNS,
+}
 
 
 PLATFORM_SCHEMA = PLATFORM_SCHEMA.extend(
     {
-        vol.Required(CONF_LANGUAGE, default="english"): vol.In(["english", "french"]),
-        vol.Optional(CONF_STATION): validate_station,
+        vol.Required(CONF_LANGUAGE, default="english"): vol.In(
+            [*LANGUAGES, LANGUAGE_BOTH]
+        ),
+        vol.Exclusive(CONF_STATION, "station"): validate_station,
+        vol.Exclusive(CONF_STATIONS, "station"): vol.All(
+            cv.ensure_list, [validate_station]
+        ),
         vol.Inclusive(CONF_LATITUDE, "latlon"): cv.latitude,
         vol.Inclusive(CONF_LONGITUDE, "latlon"): cv.longitude,
+        vol.Optional(CONF_DIAGNOSTICS, default=False): cv.boolean,
     }
 )
 
 
 async def async_setup_platform(hass, config, async_add_entities, discovery_info=None):
     """Set up the Environment Canada sensor."""
+    lat = config.get(CONF_LATITUDE, hass.config.latitude)
+    lon = config.get(CONF_LONGITUDE, hass.config.longitude)
+
+    if config.get(CONF_STATIONS):
+        await async_setup_stations(
+            hass, config[CONF_STATIONS], None, config, async_add_entities
+        )
+        return
 
-    if config.get(CONF_STATION):
-        ec_data = ECWeather(
-            station_id=config[CONF_STATION], language=config.get(CONF_LANGUAGE)
+    station_id = config.get(CONF_STATION) or await async_closest_station(
+        hass, lat, lon
+    )
+    if config[CONF_LANGUAGE] == LANGUAGE_BOTH:
+        await async_setup_stations(
+            hass, [station_id], (lat, lon), config, async_add_entities
         )
-    else:
-        lat = config.get(CONF_LATITUDE, hass.config.latitude)
-        lon = config.get(CONF_LONGITUDE, hass.config.longitude)
-        ec_data = ECWeather(coordinates=(lat, lon), language=config.get(CONF_LANGUAGE))
-
-    async def async_update_data():
-        """Fetch data from Environment Canada."""
-        async with async_timeout.timeout(10):
-            await ec_data.update()
-        ec_data.conditions.update(ec_data.alerts)
-        return ec_data.conditions
-
-    coordinator = DataUpdateCoordinator(
-        hass,
-        _LOGGER,
-        name="environment_canada_sensor",
-        update_method=async_update_data,
-        update_interval=timedelta(minutes=5),
+        return
+
+    coordinator = get_weather_data(
+        hass, station_id, (lat, lon), config.get(CONF_LANGUAGE)
     )
+    ec_data = coordinator.ec_data
 
     # Fetch initial data so we have data when entities subscribe
-    await coordinator.async_refresh()
+    await coordinator.async_first_refresh()
 
-    async_add_entities(
-        ECSensor(coordinator, sensor_type, ec_data.language, ec_data.metadata)
+    entities = [
+        ECSensor(
+            coordinator, coordinator, sensor_type, ec_data.language, ec_data.metadata
+        )
         for sensor_type in coordinator.data
+    ]
+    if config[CONF_DIAGNOSTICS]:
+        entities.append(ECTimingSensor(coordinator, coordinator))
+    async_add_entities(entities)
+
+
+async def async_setup_entry(hass, entry, async_add_entities):
+    """Set up the Environment Canada sensor from a config entry."""
+    config = PLATFORM_SCHEMA(
+        {
+            CONF_PLATFORM: DOMAIN,
+            CONF_STATION: entry.data[CONF_STATION],
+            CONF_LANGUAGE: entry.options.get(
+                CONF_LANGUAGE, entry.data[CONF_LANGUAGE]
+            ),
+        }
+    )
+    await async_setup_platform(hass, config, async_add_entities)
+
+
+async def async_setup_stations(
+    hass, station_ids, coordinates, config, async_add_entities
+):
+    """Set up sensors for stations and languages sharing one refresh schedule.
+
+    With both languages, each station's English and French documents are
+    refreshed in the same cycle. Numeric sensors are created once, and
+    text sensors once per language.
+    """
+    bilingual = config[CONF_LANGUAGE] == LANGUAGE_BOTH
+    languages = LANGUAGES if bilingual else [config[CONF_LANGUAGE]]
+    stations = [
+        [
+            get_weather_data(hass, station_id, coordinates, language)
+            for language in languages
+        ]
+        for station_id in station_ids
+    ]
+    coordinator = ECStationsUpdateCoordinator(
+        hass, [hub for hubs in stations for hub in hubs]
     )
 
+    # Load initial data so we have data when entities subscribe
+    await coordinator.async_first_refresh()
+
+    show_location = len(station_ids) > 1
+    entities = []
+    for hubs in stations:
+        primary = hubs[0]
+        if primary.data is None:
+            _LOGGER.warning("No data from %s, skipping its sensors", primary.name)
+            continue
+
+        for sensor_type in primary.data:
+            if bilingual and sensor_type in TEXT_SENSOR_TYPES:
+                sensor_hubs = [hub for hub in hubs if hub.data is not None]
+            else:
+                sensor_hubs = [primary]
+            entities.extend(
+                ECSensor(
+                    coordinator,
+                    hub,
+                    sensor_type,
+                    hub.ec_data.language,
+                    hub.ec_data.metadata,
+                    show_location=show_location,
+                    bilingual=bilingual,
+                )
+                for hub in sensor_hubs
+            )
+        if config[CONF_DIAGNOSTICS]:
+            entities.extend(
+                ECTimingSensor(coordinator, hub) for hub in hubs if hub.data is not None
+            )
+    async_add_entities(entities)
+
 
 class ECSensor(CoordinatorEntity):
     """Implementation of an Environment Canada sensor."""
 
-    def __init__(self, coordinator, sensor_type, language, metadata):
+    def __init__(
+        self,
+        coordinator,
+        station,
+        sensor_type,
+        language,
+        metadata,
+        show_location=False,
+        bilingual=False,
+    ):
         """Initialize the sensor."""
         super().__init__(coordinator)
+        self.station = station
         self.sensor_type = sensor_type
         self.language = language
         self.metadata = metadata
+        self.show_location = show_location
+        self.bilingual = bilingual
+        self._written = None
 
     @property
     def unique_id(self) -> str:
         """Return the unique ID of the sensor."""
+        if self.bilingual and self.sensor_type in TEXT_SENSOR_TYPES:
+            return f"{self.metadata['location']}-{self.sensor_type}-{self.language}"
         return f"{self.metadata['location']}-{self.sensor_type}"
 
     @property
     def name(self):
         """Return the name of the sensor."""
-        return SENSOR_TYPES[self.sensor_type][self.language]
+        if self.bilingual and self.sensor_type not in TEXT_SENSOR_TYPES:
+            labels = [SENSOR_TYPES[self.sensor_type][lang] for lang in LANGUAGES]
+            name = " / ".join(dict.fromkeys(labels))
+        else:
+            name = SENSOR_TYPES[self.sensor_type][self.language]
+        if self.show_location:
+            return f"{self.metadata.get('location')} {name}"
+        return name
+
+    @property
+    def available(self):
+        """Return whether this sensor's station was last updated successfully."""
+        return super().available and self.station.last_update_success
+
+    async def async_added_to_hass(self):
+        """Also follow the station's fast alert refresh for alert sensors."""
+        await super().async_added_to_hass()
+        if self.sensor_type in ALERT_PATTERNS:
+            self.async_on_remove(
+                self.station.alerts.async_add_listener(self._handle_coordinator_update)
+            )
+
+    @callback
+    def _handle_coordinator_update(self):
+        """Write state only when this sensor's data or freshness changed."""
+        written = (
+            self.station.revisions.get(self.sensor_type),
+            self.available,
+            self.station.stale,
+        )
+        if written == self._written:
+            return
+        self._written = written
+        self.async_write_ha_state()
 
     @property
     def icon(self):
@@ -120,9 +254,9 @@ class ECSensor(CoordinatorEntity):
     @property
     def state(self):
         """Return the state of the sensor."""
-        value = self.coordinator.data[self.sensor_type].get("value")
+        value = self.station.data[self.sensor_type]
 
-        if isinstance(value, list):
+        if isinstance(value, tuple):
             return " | ".join([str(s.get("title")) for s in value])[:255]
         if self.sensor_type == "tendency":
             return str(value).capitalize()
@@ -136,12 +270,6 @@ class ECSensor(CoordinatorEntity):
         """Return the units of measurement."""
         return SENSOR_TYPES[self.sensor_type][ATTR_UNIT]
 
-    async def async_update(self):
-        """Update current conditions."""
-        await self.ec_data.update()
-
-        self.ec_data.conditions.update(self.ec_data.alerts)
-
     @property
     def device_state_attributes(self):
         """Return the state attributes of the device."""
@@ -149,6 +277,7 @@ class ECSensor(CoordinatorEntity):
             ATTR_ATTRIBUTION: ATTRIBUTION,
             ATTR_LOCATION: self.metadata.get("location"),
             ATTR_STATION: self.metadata.get("station"),
+            ATTR_STALE: self.station.stale,
         }
 
         timestamp = self.metadata.get("timestamp")
@@ -157,8 +286,52 @@ class ECSensor(CoordinatorEntity):
         else:
             attributes[ATTR_UPDATED] = None
 
-        value = self.coordinator.data[self.sensor_type].get("value")
-        if isinstance(value, list):
+        value = self.station.data[self.sensor_type]
+        if isinstance(value, tuple):
             attributes[ATTR_TIME] = " | ".join([str(s.get("date")) for s in value])
 
         return attributes
+
+
+class ECTimingSensor(CoordinatorEntity):
+    """Refresh timings and cache statistics for one station and language."""
+
+    def __init__(self, coordinator, station):
+        """Initialize the diagnostic sensor."""
+        super().__init__(coordinator)
+        self.station = station
+        self.metadata = station.ec_data.metadata
+
+    @property
+    def unique_id(self) -> str:
+        """Return the unique ID of the sensor."""
+        return f"{self.metadata['location']}-timings-{self.station.ec_data.language}"
+
+    @property
+    def name(self):
+        """Return the name of the sensor."""
+        return f"{self.metadata.get('location')} Refresh Time"
+
+    @property
+    def icon(self):
+        """Return the icon."""
+        return "mdi:timer-outline"
+
+    @property
+    def state(self):
+        """Return the 95th percentile of recent full refreshes, in milliseconds."""
+        return self.station.timings.percentile("update", 95)
+
+    @property
+    def unit_of_measurement(self):
+        """Return the units of measurement."""
+        return TIME_MILLISECONDS
+
+    @property
+    def device_state_attributes(self):
+        """Return every timing, payload size and cache hit rate."""
+        return {
+            ATTR_ATTRIBUTION: ATTRIBUTION,
+            ATTR_STATION: self.metadata.get("station"),
+            **self.station.timings.summary(),
+        }
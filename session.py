@@ -0,0 +1,37 @@
+"""Pooled HTTP session for the integration's own requests."""
+import aiohttp
+from aiohttp.hdrs import USER_AGENT
+
+from homeassistant.const import EVENT_HOMEASSISTANT_CLOSE
+from homeassistant.core import callback
+from homeassistant.helpers.aiohttp_client import SERVER_SOFTWARE
+
+from .const import DOMAIN
+
+DATA_SESSION = "session"
+
+# Keep a few connections alive to each host, however many stations poll it
+MAX_CONNECTIONS_PER_HOST = 4
+KEEPALIVE_TIMEOUT = 60
+
+
+@callback
+def async_get_session(hass):
+    """Return the shared session, creating it on first use."""
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    if DATA_SESSION not in domain_data:
+        connector = aiohttp.TCPConnector(
+            limit_per_host=MAX_CONNECTIONS_PER_HOST,
+            keepalive_timeout=KEEPALIVE_TIMEOUT,
+            enable_cleanup_closed=True,
+        )
+        session = aiohttp.ClientSession(
+            connector=connector, headers={USER_AGENT: SERVER_SOFTWARE}
+        )
+
+        async def async_close_session(event):
+            await session.close()
+
+        hass.bus.async_listen_once(EVENT_HOMEASSISTANT_CLOSE, async_close_session)
+        domain_data[DATA_SESSION] = session
+    return domain_data[DATA_SESSION]
@@ -0,0 +1,189 @@
+"""Index of Environment Canada stations for nearest-station lookups."""
+import asyncio
+import csv
+import datetime
+import logging
+import math
+import re
+from typing import NamedTuple
+
+from aiohttp import ClientError
+import async_timeout
+import voluptuous as vol
+
+from homeassistant.helpers.storage import Store
+import homeassistant.util.dt as dt
+
+from .const import DOMAIN
+from .session import async_get_session
+
+_LOGGER = logging.getLogger(__name__)
+
+DATA_STATIONS = "stations"
+DATA_STATIONS_LOCK = "stations_lock"
+
+SITE_LIST_URL = "https://dd.weather.gc.ca/citypage_weather/docs/site_list_en.csv"
+SITE_LIST_MAX_AGE = datetime.timedelta(days=7)
+SITE_LIST_TIMEOUT = 10
+
+STORAGE_KEY = f"{DOMAIN}.stations"
+STORAGE_VERSION = 1
+
+EARTH_RADIUS = 6371.0
+KM_PER_DEGREE = 111.19
+
+
+class NearbyStation(NamedTuple):
+    """A station and its distance from a point, in kilometres."""
+
+    station_id: str
+    name: str
+    distance: float
+
+
+def validate_station(station):
+    """Check that the station ID is well-formed."""
+    if station is None:
+        return
+    if not re.fullmatch(r"[A-Z]{2}/s0000\d{3}", station):
+        raise vol.error.Invalid('Station ID must be of the form "XX/s0000###"')
+    return station
+
+
+async def async_nearest_stations(hass, lat, lon, count=1):
+    """Return the stations closest to a point, nearest first."""
+    index = await async_get_station_index(hass)
+    if index is None:
+        return []
+    return index.nearest(lat, lon, count)
+
+
+async def async_closest_station(hass, lat, lon):
+    """Return the ID of the station closest to a point, if the index loads."""
+    nearest = await async_nearest_stations(hass, lat, lon)
+    if not nearest:
+        return None
+    return nearest[0].station_id
+
+
+async def async_get_station_index(hass):
+    """Return the shared station index, loading or downloading it once."""
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    lock = domain_data.setdefault(DATA_STATIONS_LOCK, asyncio.Lock())
+    async with lock:
+        if DATA_STATIONS not in domain_data:
+            sites = await _async_load_sites(hass)
+            if not sites:
+                return None
+            domain_data[DATA_STATIONS] = StationIndex(sites)
+    return domain_data[DATA_STATIONS]
+
+
+async def _async_load_sites(hass):
+    """Return the site list from .storage, downloading it when stale."""
+    store = Store(hass, STORAGE_VERSION, STORAGE_KEY)
+    stored = await store.async_load()
+    if stored:
+        fetched = dt.parse_datetime(stored["fetched"])
+        if fetched and dt.utcnow() - fetched < SITE_LIST_MAX_AGE:
+            return stored["sites"]
+
+    session = async_get_session(hass)
+    try:
+        async with async_timeout.timeout(SITE_LIST_TIMEOUT):
+            async with session.get(SITE_LIST_URL) as response:
+                response.raise_for_status()
+                sites = parse_site_list(await response.text())
+    except (asyncio.TimeoutError, ClientError) as err:
+        _LOGGER.warning("Error fetching Environment Canada site list: %s", err)
+        return stored["sites"] if stored else None
+
+    await store.async_save({"fetched": dt.utcnow().isoformat(), "sites": sites})
+    return sites
+
+
+def parse_site_list(text):
+    """Parse the site list CSV into [station_id, name, lat, lon] rows."""
+    lines = text.splitlines()
+    # The file starts with a title line ahead of the column headings
+    if lines and "Codes" not in lines[0]:
+        lines = lines[1:]
+
+    sites = []
+    for row in csv.DictReader(lines):
+        try:
+            lat = float(row["Latitude"].rstrip("NS"))
+            lon = -float(row["Longitude"].rstrip("EW"))
+        except (KeyError, TypeError, ValueError):
+            continue
+        if row["Province Codes"] == "HEF":
+            continue
+        station_id = f"{row['Province Codes']}/{row['Codes']}"
+        sites.append([station_id, row["English Names"], lat, lon])
+    return sites
+
+
+def distance(lat1, lon1, lat2, lon2):
+    """Return the great-circle distance between two points, in kilometres."""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    hav = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS * math.asin(math.sqrt(hav))
+
+
+class StationIndex:
+    """Stations bucketed into a one-degree grid for nearest lookups.
+
+    A lookup searches rings of cells outward from the point's cell and
+    stops once no unsearched cell can hold a closer station.
+    """
+
+    def __init__(self, sites):
+        """Build the grid from [station_id, name, lat, lon] rows."""
+        self._cells = {}
+        self._size = len(sites)
+        for site in sites:
+            self._cells.setdefault(self._cell(site[2], site[3]), []).append(site)
+
+    @staticmethod
+    def _cell(lat, lon):
+        """Return the grid cell containing a point."""
+        return (math.floor(lat), math.floor(lon))
+
+    @staticmethod
+    def _ring(cell_lat, cell_lon, ring):
+        """Yield the cells on the square ring at a distance around a cell."""
+        if ring == 0:
+            yield (cell_lat, cell_lon)
+            return
+        for offset in range(-ring, ring + 1):
+            yield (cell_lat - ring, cell_lon + offset)
+            yield (cell_lat + ring, cell_lon + offset)
+        for offset in range(-ring + 1, ring):
+            yield (cell_lat + offset, cell_lon - ring)
+            yield (cell_lat + offset, cell_lon + ring)
+
+    def nearest(self, lat, lon, count=1):
+        """Return the count stations closest to a point, nearest first."""
+        cell_lat, cell_lon = self._cell(lat, lon)
+        found = []
+        searched = 0
+        ring = 0
+        while searched < self._size:
+            for cell in self._ring(cell_lat, cell_lon, ring):
+                for station_id, name, s_lat, s_lon in self._cells.get(cell, ()):
+                    distance_km = distance(lat, lon, s_lat, s_lon)
+                    found.append(NearbyStation(station_id, name, distance_km))
+                    searched += 1
+            found.sort(key=lambda station: station.distance)
+
+            # Unsearched cells are at least `ring` degrees away
+            min_cos = math.cos(math.radians(min(89.0, abs(lat) + ring + 1)))
+            if len(found) >= count and (
+                found[count - 1].distance <= ring * KM_PER_DEGREE * min_cos
+            ):
+                break
+            ring += 1
+        return found[:count]
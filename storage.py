@@ -0,0 +1,77 @@
+"""Persistent cache of the last Environment Canada data, for fast startup."""
+import os
+
+from homeassistant.helpers.storage import STORAGE_DIR, Store
+
+from .const import DOMAIN
+
+DATA_CACHE = "cache"
+
+STORAGE_KEY = f"{DOMAIN}.cache"
+STORAGE_VERSION = 1
+SAVE_DELAY = 60
+
+
+async def async_get_cache(hass):
+    """Return the shared cache, loading it from disk on first use."""
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    if DATA_CACHE not in domain_data:
+        domain_data[DATA_CACHE] = hass.async_create_task(_async_load_cache(hass))
+    return await domain_data[DATA_CACHE]
+
+
+async def _async_load_cache(hass):
+    """Load the cache from .storage."""
+    store = Store(hass, STORAGE_VERSION, STORAGE_KEY)
+    return ECDataCache(hass, store, await store.async_load() or {})
+
+
+class ECDataCache:
+    """Last known data for every station and radar source.
+
+    Parsed data is kept in one JSON store; radar images are written next
+    to it as raw files so they are not inflated by encoding.
+    """
+
+    def __init__(self, hass, store, data):
+        """Initialize the cache."""
+        self.hass = hass
+        self._store = store
+        self._data = data
+
+    def get(self, key):
+        """Return the cached data for a key, if any."""
+        return self._data.get(key)
+
+    def set(self, key, value):
+        """Cache data for a key and schedule a save."""
+        self._data[key] = value
+        self._store.async_delay_save(lambda: self._data, SAVE_DELAY)
+
+    async def async_load_file(self, name):
+        """Return the contents of a cached file, or None."""
+        return await self.hass.async_add_executor_job(self._load_file, name)
+
+    async def async_save_file(self, name, content):
+        """Write a cached file."""
+        await self.hass.async_add_executor_job(self._save_file, name, content)
+
+    def _path(self, name):
+        """Return the path of a cached file."""
+        return self.hass.config.path(STORAGE_DIR, DOMAIN, name)
+
+    def _load_file(self, name):
+        """Read a cached file."""
+        try:
+            with open(self._path(name), "rb") as cached:
+                return cached.read()
+        except OSError:
+            return None
+
+    def _save_file(self, name, content):
+        """Write a cached file, replacing it atomically."""
+        path = self._path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(f"{path}.tmp", "wb") as cached:
+            cached.write(content)
+        os.replace(f"{path}.tmp", path)
@@ -0,0 +1,8 @@
+"""Run the tests offline, against the stand-ins in benchmarks/stubs."""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+import support  # noqa: E402,F401  pylint: disable=wrong-import-position
@@ -0,0 +1,63 @@
+"""Tests for serving stale data while Environment Canada is failing."""
+import asyncio
+import tempfile
+
+import support
+
+breaker = support.load_module("breaker")
+sensor = support.load_module("sensor")
+
+
+def test_failing_citypage_opens_the_breaker_and_keeps_stale_data():
+    """Error statuses count as failures, and entities keep the last data."""
+
+    async def test():
+        server = support.CitypageServer()
+        await server.async_start()
+        with tempfile.TemporaryDirectory() as config_dir:
+            hass = await support.async_setup_hass(config_dir, server)
+            try:
+                await async_run_outage(hass, server)
+            finally:
+                await hass.async_stop()
+                await server.async_stop()
+
+    asyncio.run(test())
+
+
+async def async_run_outage(hass, server):
+    """Refresh a station through an outage of its citypage host."""
+    integration = support.load_integration()
+    station = integration.get_weather_data(hass, support.STATION, None)
+    await station.async_refresh()
+    entity = sensor.ECSensor(
+        station, station, "temperature", "english", station.ec_data.metadata
+    )
+    await entity.async_add_to_hass(hass, "sensor.temperature")
+    state, attributes = hass.states["sensor.temperature"]
+    snapshot = station.data
+    assert not attributes[sensor.ATTR_STALE]
+
+    server.publish()
+    server.errors = [503] * breaker.FAILURE_THRESHOLD
+    for _ in range(breaker.FAILURE_THRESHOLD):
+        requests = len(server.requests)
+        await station.async_refresh()
+        await hass.async_block_till_done()
+        assert [request.method for request in server.requests[requests:]] == [
+            "HEAD"
+        ]
+        assert station.last_update_success
+        assert station.data is snapshot
+
+    citypage_breaker = breaker.get_breaker(hass, integration.CITYPAGE_HOST)
+    assert citypage_breaker.state == breaker.STATE_OPEN
+
+    requests = len(server.requests)
+    await station.async_refresh()
+    assert len(server.requests) == requests
+    assert station.data is snapshot
+    assert hass.states["sensor.temperature"] == (
+        state,
+        {**attributes, sensor.ATTR_STALE: True},
+    )
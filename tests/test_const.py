@@ -0,0 +1,28 @@
+"""Tests for the icon code to condition index."""
+import support
+
+const = support.load_module("const")
+weather = support.load_module("weather")
+
+
+def test_shared_codes_keep_their_first_condition():
+    """Codes listed under snow and hail resolve as in ICON_CONDITION_MAP order."""
+    assert weather.icon_code_to_condition(26) == "snowy"
+    assert weather.icon_code_to_condition(27) == "snowy-rainy"
+
+
+def test_every_listed_code_is_indexed():
+    """Each code resolves to the first condition that lists it."""
+    expected = {}
+    for condition, codes in const.ICON_CONDITION_MAP.items():
+        for code in codes:
+            expected.setdefault(code, condition)
+    assert const.ICON_CODE_TO_CONDITION == expected
+    assert weather.icon_code_to_condition(99) is None
+
+
+def test_index_loop_names_are_not_exported():
+    """The loop building the index leaves no names behind in the module."""
+    assert not hasattr(const, "_condition")
+    assert not hasattr(const, "_codes")
+    assert not hasattr(const, "_code")
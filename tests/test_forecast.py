@@ -0,0 +1,160 @@
+"""Tests for building the daily forecast from any half-day layout."""
+import datetime
+
+import pytest
+import voluptuous as vol
+
+import support
+
+forecast = support.load_module("forecast")
+weather = support.load_module("weather")
+
+NOW = datetime.datetime(2021, 9, 15, 12, tzinfo=datetime.timezone.utc)
+
+
+def half_days(*temperatures, first="high"):
+    """Return alternating day and night periods with the given temperatures."""
+    classes = ["high", "low"] if first == "high" else ["low", "high"]
+    return [
+        {
+            "period": f"Period {index}",
+            "icon_code": "02" if classes[index % 2] == "high" else "30",
+            "temperature": temperature,
+            "temperature_class": classes[index % 2],
+            "precip_probability": 10 * index,
+        }
+        for index, temperature in enumerate(temperatures)
+    ]
+
+
+# Morning: today, tonight and six more days, the last without its night
+MORNING = half_days(24, 13, 20, 10, 19, 7, 21, 11, 22, 14, 17, 8, 18)
+# Afternoon: tonight, then six days, the last without its night
+AFTERNOON = half_days(13, 20, 10, 19, 7, 21, 11, 22, 14, 17, 8, 18, first="low")
+# Evening: tonight, then six days and nights
+EVENING = half_days(13, 20, 10, 19, 7, 21, 11, 22, 14, 17, 8, 18, 9, first="low")
+
+
+def temperatures(days):
+    """Return each day's high and low."""
+    return [(day.temperature, day.temperature_low) for day in days]
+
+
+def test_morning_issue_pairs_each_day_with_its_night():
+    """A forecast starting with today pairs it with tonight."""
+    days = forecast.build_daily_forecast(MORNING, now=NOW)
+    assert temperatures(days) == [
+        (24, 13),
+        (20, 10),
+        (19, 7),
+        (21, 11),
+        (22, 14),
+        (17, 8),
+        (18, None),
+    ]
+    assert days[0].condition == "partlycloudy"
+    assert days[0].precip_probability == 0
+    assert days[1].precip_probability == 20
+
+
+def test_afternoon_issue_starts_with_tonight_alone():
+    """A forecast starting with tonight gives today no high."""
+    days = forecast.build_daily_forecast(AFTERNOON, now=NOW)
+    assert temperatures(days) == [
+        (None, 13),
+        (20, 10),
+        (19, 7),
+        (21, 11),
+        (22, 14),
+        (17, 8),
+        (18, None),
+    ]
+    assert days[0].condition == "clear-night"
+
+
+def test_evening_issue_fills_seven_days_with_nights():
+    """The seven-day limit counts tonight as a day of its own."""
+    days = forecast.build_daily_forecast(EVENING, now=NOW)
+    assert temperatures(days) == [
+        (None, 13),
+        (20, 10),
+        (19, 7),
+        (21, 11),
+        (22, 14),
+        (17, 8),
+        (18, 9),
+    ]
+
+
+@pytest.mark.parametrize("half_day_layout", [MORNING, AFTERNOON, EVENING])
+def test_days_follow_each_other_from_now(half_day_layout):
+    """Each day is dated one day after the last, starting now."""
+    days = forecast.build_daily_forecast(half_day_layout, now=NOW)
+    assert [day.time for day in days] == [
+        NOW + datetime.timedelta(days=offset) for offset in range(len(days))
+    ]
+
+
+@pytest.mark.parametrize(
+    "half_day_layout, expected",
+    [
+        ([], []),
+        (MORNING[:1], [(24, None)]),
+        (MORNING[:3], [(24, 13), (20, None)]),
+        (AFTERNOON[:2], [(None, 13), (20, None)]),
+    ],
+)
+def test_truncated_feed_builds_the_days_it_has(half_day_layout, expected):
+    """A feed with fewer half-days than usual gives fewer days, not an error."""
+    days = forecast.build_daily_forecast(half_day_layout, now=NOW)
+    assert temperatures(days) == expected
+
+
+def test_missing_values_are_left_empty():
+    """Periods without a parsed value give None rather than failing."""
+    half_day = {**MORNING[0], "icon_code": None, "precip_probability": ""}
+    (day,) = forecast.build_daily_forecast([half_day], now=NOW)
+    assert day.condition is None
+    assert day.precip_probability is None
+
+
+def test_longer_feed_is_limited_to_seven_days():
+    """No more than the seven published days are built."""
+    long_feed = MORNING + half_days(12, 15, 6, 9, first="low")
+    days = forecast.build_daily_forecast(long_feed, now=NOW)
+    assert len(days) == forecast.MAX_FORECAST_DAYS == 7
+    assert temperatures(days)[-1] == (18, 12)
+
+
+@pytest.mark.parametrize("count", range(1, 8))
+def test_day_count_limits_the_forecast(count):
+    """The configured number of days is built and no more."""
+    days = forecast.build_daily_forecast(MORNING, count, now=NOW)
+    assert len(days) == count
+
+
+def test_forecast_days_option_is_limited_to_seven():
+    """The weather platform accepts one to seven days, defaulting to six."""
+    config = weather.PLATFORM_SCHEMA({"platform": "environment_canada"})
+    assert config[weather.CONF_FORECAST_DAYS] == 6
+    for days in (0, 8):
+        with pytest.raises(vol.Invalid):
+            weather.PLATFORM_SCHEMA(
+                {"platform": "environment_canada", "forecast_days": days}
+            )
+
+
+@pytest.mark.parametrize("language", list(support.LANGUAGES))
+def test_recorded_morning_citypage(language):
+    """The recorded morning issue gives six days by default, or all seven."""
+    ec_data = support.parsed_weather(language)
+    days = weather.get_forecast(ec_data, "daily")
+    assert len(days) == weather.DEFAULT_FORECAST_DAYS
+    assert days[0]["temperature"] == 24
+    assert days[0]["templow"] == 13
+    assert days[0]["precipitation_probability"] == 60
+
+    days = weather.get_forecast(ec_data, "daily", forecast.MAX_FORECAST_DAYS)
+    assert len(days) == 7
+    assert days[-1]["temperature"] == 18
+    assert days[-1]["templow"] is None
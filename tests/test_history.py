@@ -0,0 +1,146 @@
+"""Tests for the on-disk observation history."""
+import asyncio
+import datetime
+import os
+
+from homeassistant.components import websocket_api
+from homeassistant.core import HomeAssistant
+
+import support
+
+history = support.load_module("history")
+
+# Start of an hour, in epoch seconds
+HOUR_START = 1631721600
+HOUR = history.HOUR
+
+
+def test_append_rolls_up_each_hour_once_the_next_begins(tmp_path):
+    """An hour is written as a rollup when a sample from a later hour arrives."""
+    series = history.HistorySeries(str(tmp_path))
+    for minutes, value in ((0, 10.0), (20, 14.0), (40, 12.0)):
+        assert series.append(HOUR_START + minutes * 60, value)
+    assert not series.append(HOUR_START + 40 * 60, 99.0)
+    assert not os.path.exists(tmp_path / "hourly.rollups")
+
+    series.append(HOUR_START + HOUR + 60, 8.0)
+    assert os.path.getsize(tmp_path / "hourly.rollups") == history.ROLLUP.size
+    assert series.rollups(HOUR_START, HOUR_START + 2 * HOUR) == [
+        (HOUR_START, 10.0, 14.0, 12.0, 3),
+        (HOUR_START + HOUR, 8.0, 8.0, 8.0, 1),
+    ]
+
+
+def test_reopened_series_restores_the_open_hour(tmp_path):
+    """Samples of the hour not yet rolled up are read back on reopening."""
+    series = history.HistorySeries(str(tmp_path))
+    series.append(HOUR_START, 5.0)
+    series.append(HOUR_START + HOUR, 6.0)
+    series.append(HOUR_START + HOUR + 600, 8.0)
+
+    reopened = history.HistorySeries(str(tmp_path))
+    assert reopened.last_time == HOUR_START + HOUR + 600
+    assert not reopened.append(HOUR_START + HOUR + 300, 1.0)
+    reopened.append(HOUR_START + 2 * HOUR, 9.0)
+    assert reopened.rollups(HOUR_START, HOUR_START + 2 * HOUR) == [
+        (HOUR_START, 5.0, 5.0, 5.0, 1),
+        (HOUR_START + HOUR, 6.0, 8.0, 7.0, 2),
+    ]
+
+
+def test_samples_span_chunk_boundaries(tmp_path, monkeypatch):
+    """A range over several chunk files reads each of them in order."""
+    monkeypatch.setattr(history, "CHUNK_ROWS", 4)
+    series = history.HistorySeries(str(tmp_path))
+    for row in range(10):
+        series.append(HOUR_START + row * 600, float(row))
+    chunks = sorted(name for name in os.listdir(tmp_path) if name.endswith(".samples"))
+    assert len(chunks) == 3
+
+    samples = series.samples(HOUR_START + 2 * 600, HOUR_START + 9 * 600)
+    assert samples == [(HOUR_START + row * 600, float(row)) for row in range(2, 9)]
+    assert series.samples(HOUR_START + 4 * 600, HOUR_START + 5 * 600) == [
+        (HOUR_START + 4 * 600, 4.0)
+    ]
+    assert history.HistorySeries(str(tmp_path)).samples(0, HOUR_START + HOUR) == [
+        (HOUR_START + row * 600, float(row)) for row in range(6)
+    ]
+
+
+def test_rollups_are_summarized_by_sample_count():
+    """The summary weights each hour's mean by its number of samples."""
+    rollups = [
+        (HOUR_START, 10.0, 14.0, 12.0, 3),
+        (HOUR_START + HOUR, 4.0, 4.0, 4.0, 1),
+    ]
+    assert history.summarize(rollups) == {
+        "min": 4.0,
+        "max": 14.0,
+        "mean": 10.0,
+        "count": 4,
+    }
+    assert history.summarize([]) == {
+        "min": None,
+        "max": None,
+        "mean": None,
+        "count": 0,
+    }
+
+
+def test_websocket_history(tmp_path):
+    """The websocket command reads recorded history and rejects bad queries."""
+
+    async def test():
+        hass = HomeAssistant(str(tmp_path))
+        await support.load_integration().async_setup(hass, {})
+        store = await history.async_get_history(hass)
+        start = datetime.datetime.fromtimestamp(HOUR_START, datetime.timezone.utc)
+        for minutes, temperature in ((0, 10.0), (30, 12.0), (60, 15.0)):
+            await store.async_record(
+                support.STATION,
+                start + datetime.timedelta(minutes=minutes),
+                {"temperature": temperature, "pressure": None},
+            )
+
+        connection = websocket_api.ActiveConnection()
+        query = {
+            "id": 1,
+            "type": "environment_canada/history",
+            "station": support.STATION,
+            "field": "temperature",
+            "start_time": start.isoformat(),
+            "end_time": (start + 2 * datetime.timedelta(hours=1)).isoformat(),
+        }
+        messages = [
+            query,
+            {**query, "id": 2, "hourly": False},
+            {**query, "id": 3, "station": "Ottawa"},
+            {**query, "id": 4, "field": "dewpoint"},
+            {**query, "id": 5, "field": "pressure"},
+            {**query, "id": 6, "start_time": "yesterday"},
+        ]
+        for msg in messages:
+            await websocket_api.async_handle(hass, connection, msg)
+        await hass.async_stop()
+        return connection.messages
+
+    hourly, samples, station, field, unrecorded, time = asyncio.run(test())
+    assert hourly["result"] == {
+        "points": [
+            {"time": HOUR_START, "min": 10.0, "max": 12.0, "mean": 11.0},
+            {"time": HOUR_START + HOUR, "min": 15.0, "max": 15.0, "mean": 15.0},
+        ],
+        "summary": {"min": 10.0, "max": 15.0, "mean": 37.0 / 3, "count": 3},
+    }
+    assert [point["value"] for point in samples["result"]["points"]] == [
+        10.0,
+        12.0,
+        15.0,
+    ]
+    assert station["error"]["code"] == "invalid_format"
+    assert field["error"]["code"] == "invalid_format"
+    assert unrecorded["result"]["points"] == []
+    assert unrecorded["result"]["summary"]["count"] == 0
+    assert time["error"]["code"] == "invalid_time"
+    history_path = tmp_path / ".storage" / "environment_canada" / "history"
+    assert os.listdir(history_path / "ON_s0000430") == ["temperature"]
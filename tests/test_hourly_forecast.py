@@ -0,0 +1,132 @@
+"""Tests for the rolling hourly forecast store."""
+import asyncio
+import datetime
+import tempfile
+
+import pytest
+
+import support
+
+forecast = support.load_module("forecast")
+weather = support.load_module("weather")
+
+START = datetime.datetime(2021, 9, 15, 16, tzinfo=datetime.timezone.utc)
+HOUR = datetime.timedelta(hours=1)
+
+PERIOD_FORMATS = {
+    "datetime": lambda time: time,
+    "iso": lambda time: time.isoformat(),
+    "compact": lambda time: time.strftime("%Y%m%d%H%M"),
+}
+
+
+def hours(start=START, count=24, period_format="datetime", temperature=20):
+    """Return hourly forecasts as env_canada gives them."""
+    return [
+        {
+            "period": PERIOD_FORMATS[period_format](start + offset * HOUR),
+            "condition": "Sunny",
+            "temperature": temperature + offset,
+            "icon_code": "00",
+            "precip_probability": 0,
+        }
+        for offset in range(count)
+    ]
+
+
+def times(window):
+    """Return the times of a window's forecasts."""
+    return [hour["datetime"] for hour in window]
+
+
+def expected_times(start, count):
+    """Return the ISO times of consecutive hours."""
+    return [(start + offset * HOUR).isoformat() for offset in range(count)]
+
+
+@pytest.mark.parametrize("period_format", list(PERIOD_FORMATS))
+def test_every_period_format_is_read(period_format):
+    """Datetime, ISO and compact periods all give the same forecast."""
+    store = forecast.HourlyForecastStore()
+    store.update(hours(period_format=period_format), now=START)
+    window = store.window(now=START)
+    assert times(window) == expected_times(START, 24)
+    assert window[0] == {
+        "datetime": START.isoformat(),
+        "temperature": 20,
+        "condition": "sunny",
+        "precipitation_probability": 0,
+    }
+
+
+def test_past_hours_expire():
+    """Hours before the current one are left out, and dropped on update."""
+    store = forecast.HourlyForecastStore()
+    store.update(hours(), now=START)
+    later = START + 3 * HOUR
+    assert times(store.window(now=later)) == expected_times(later, 21)
+
+    store.update(hours(), now=later)
+    assert times(store.window(now=START)) == expected_times(later, 21)
+
+
+def test_hours_missing_from_a_newer_feed_are_dropped():
+    """A shorter feed replaces the hours the last one listed."""
+    store = forecast.HourlyForecastStore()
+    store.update(hours(), now=START)
+    later = START + HOUR
+    store.update(hours(later, 6), now=later)
+    assert times(store.window(now=later)) == expected_times(later, 6)
+
+
+def test_only_changed_hours_are_rebuilt():
+    """Unchanged hours keep their forecast, and changed ones are replaced."""
+    store = forecast.HourlyForecastStore()
+    feed = hours()
+    store.update(feed, now=START)
+    before = store.window(now=START)
+
+    feed[5] = {**feed[5], "temperature": 30}
+    store.update(feed, now=START)
+    after = store.window(now=START)
+    assert after[5]["temperature"] == 30
+    assert after[5] is not before[5]
+    assert all(after[hour] is before[hour] for hour in range(24) if hour != 5)
+
+
+def test_horizon_limits_the_window():
+    """A horizon gives only the next hours, and no more than are known."""
+    store = forecast.HourlyForecastStore()
+    store.update(hours(), now=START)
+    assert times(store.window(12, now=START)) == expected_times(START, 12)
+    assert len(store.window(48, now=START)) == 24
+
+
+def test_forecast_hours_option_limits_the_weather_forecast():
+    """A weather entity configured with forecast_hours shows only those hours."""
+
+    async def test():
+        server = support.CitypageServer()
+        await server.async_start()
+        with tempfile.TemporaryDirectory() as config_dir:
+            hass = await support.async_setup_hass(config_dir, server)
+            try:
+                integration = support.load_integration()
+                coordinator = integration.get_weather_data(hass, support.STATION, None)
+                await coordinator.async_refresh()
+                config = weather.PLATFORM_SCHEMA(
+                    {
+                        "platform": "environment_canada",
+                        "forecast": "hourly",
+                        "forecast_hours": 12,
+                    }
+                )
+                entity = weather.ECWeatherHA(coordinator, config)
+                await entity.async_add_to_hass(hass, "weather.hourly")
+                assert len(entity.forecast) == 12
+                assert len(weather.get_forecast(coordinator.ec_data, "hourly")) == 24
+            finally:
+                await hass.async_stop()
+                await server.async_stop()
+
+    asyncio.run(test())
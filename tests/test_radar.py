@@ -0,0 +1,60 @@
+"""Tests for extending the shared radar loop one frame at a time."""
+import asyncio
+import io
+import tempfile
+
+from PIL import Image, ImageSequence
+
+from homeassistant.util import dt
+
+import support
+
+radar = support.load_module("radar")
+
+
+def pixels(image):
+    """Return the RGB pixels of every frame of an image."""
+    return [
+        frame.convert("RGB").tobytes()
+        for frame in ImageSequence.Iterator(Image.open(io.BytesIO(image)))
+    ]
+
+
+def test_extended_loop_encodes_only_new_frames(monkeypatch):
+    """Each extension encodes the new frame, and the loop shows every frame."""
+    encoded = []
+    encode_gif_frames = radar.encode_gif_frames
+
+    def count_encoded(frames):
+        encoded.append(len(frames))
+        return encode_gif_frames(frames)
+
+    monkeypatch.setattr(radar, "encode_gif_frames", count_encoded)
+
+    async def test():
+        server = support.CitypageServer()
+        await server.async_start()
+        with tempfile.TemporaryDirectory() as config_dir:
+            hass = await support.async_setup_hass(config_dir, server)
+            try:
+                radar_data = radar.get_radar_data(hass, (45.4, -75.7), None)
+                radar_data.loop_enabled = True
+                await radar_data.async_update()
+                loaded = pixels(radar_data.loop_image)
+                for _ in range(3):
+                    radar_data.radar_object.publish()
+                    dt.travel(radar.FRAME_INTERVAL)
+                    radar_data.next_update = None
+                    await radar_data.async_update()
+                published = pixels(await radar_data.radar_object.get_loop())
+                return loaded, pixels(radar_data.loop_image), published
+            finally:
+                dt.travel(-3 * radar.FRAME_INTERVAL)
+                await hass.async_stop()
+                await server.async_stop()
+
+    loaded, extended, published = asyncio.run(test())
+    assert encoded == [len(loaded) + 1, 1, 1]
+    assert len(extended) == len(loaded) + 3
+    assert extended[: len(loaded)] == loaded
+    assert extended[-len(published) :] == published
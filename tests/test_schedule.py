@@ -0,0 +1,106 @@
+"""Tests for planning polls around Environment Canada's publish cadence."""
+import asyncio
+import datetime
+import tempfile
+
+import pytest
+
+from homeassistant.util import dt
+
+import support
+
+schedule = support.load_module("schedule")
+
+START = datetime.datetime(2021, 9, 15, 12, tzinfo=datetime.timezone.utc)
+HOUR = datetime.timedelta(hours=1)
+MINUTE = datetime.timedelta(minutes=1)
+
+
+def hourly_schedule():
+    """Return a schedule for a feed published every hour."""
+    return schedule.PublishSchedule(HOUR, MINUTE, HOUR)
+
+
+def poll(feed_schedule, start, published, hours=6):
+    """Poll a feed for some hours, returning how stale each new value was.
+
+    The feed publishes at every time given by published(now), and its value
+    is the time of its latest publish.
+    """
+    now = start
+    value = None
+    delays = []
+    while now < start + hours * HOUR:
+        latest = published(now)
+        if latest != value:
+            delays.append(now - latest)
+            value = latest
+        feed_schedule.record(value, now)
+        now += feed_schedule.next_interval(now)
+    return delays
+
+
+def on_the_hour(now):
+    """Return the latest hourly publish at or before a time."""
+    return now.replace(minute=0, second=0, microsecond=0)
+
+
+@pytest.mark.parametrize("offset", [3, 30, 55])
+def test_polls_land_just_after_each_publish(offset):
+    """Whenever polling starts, later publishes are seen within the grace."""
+    delays = poll(hourly_schedule(), START + offset * MINUTE, on_the_hour)
+    assert delays[0] == offset * MINUTE
+    assert delays[1:]
+    assert all(delay == schedule.PUBLISH_GRACE for delay in delays[1:])
+
+
+def test_late_publish_is_polled_again_soon():
+    """A publish running late is caught by the backoff from the minimum wait."""
+
+    def late(now):
+        latest = on_the_hour(now)
+        if now - latest < 5 * MINUTE:
+            latest -= HOUR
+        return latest
+
+    delays = poll(hourly_schedule(), START + 30 * MINUTE, late)
+    assert all(delay <= 10 * MINUTE for delay in delays[1:])
+
+
+def test_values_without_a_time_are_dated_to_the_poll():
+    """A value that is not a datetime is timed from when it was first seen."""
+    feed_schedule = hourly_schedule()
+    feed_schedule.record("a", START)
+    later = START + 10 * MINUTE
+    feed_schedule.record("b", later)
+    polled = later + 30 * MINUTE
+    expected = later + HOUR + schedule.PUBLISH_GRACE
+    assert feed_schedule.next_interval(polled) == expected - polled
+
+
+def test_changed_alerts_refresh_the_station():
+    """A citypage newer than the station's data is fetched after the alerts."""
+
+    async def test():
+        server = support.CitypageServer()
+        await server.async_start()
+        with tempfile.TemporaryDirectory() as config_dir:
+            hass = await support.async_setup_hass(config_dir, server)
+            try:
+                integration = support.load_integration()
+                station = integration.get_weather_data(hass, support.STATION, None)
+                server.publish(hour=dt.utcnow())
+                await station.async_refresh()
+                await station.alerts.async_refresh()
+                await hass.async_block_till_done()
+                timestamp = station.ec_data.metadata["timestamp"]
+
+                server.publish(hour=dt.utcnow() + HOUR)
+                await station.alerts.async_refresh()
+                await hass.async_block_till_done()
+                assert station.ec_data.metadata["timestamp"] == timestamp + HOUR
+            finally:
+                await hass.async_stop()
+                await server.async_stop()
+
+    asyncio.run(test())
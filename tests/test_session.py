@@ -0,0 +1,114 @@
+"""Tests for the integration's requests reusing pooled connections."""
+import asyncio
+import tempfile
+
+from homeassistant.helpers.aiohttp_client import SERVER_SOFTWARE
+
+import support
+
+session = support.load_module("session")
+stations = support.load_module("stations")
+
+STATIONS = [support.STATION, "QC/s0000623"]
+
+# Long enough that alerts are found well before the body ends
+PADDING = 512 * 1024
+
+
+async def async_run(test):
+    """Run a test against a local citypage server and a set up integration."""
+    server = support.CitypageServer()
+    for station in STATIONS:
+        server.publish(station=station)
+    await server.async_start()
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = await support.async_setup_hass(config_dir, server)
+        try:
+            await test(hass, server)
+        finally:
+            await hass.async_stop()
+            await server.async_stop()
+
+
+def integration_requests(server):
+    """Return the requests made through the integration's own session."""
+    return [
+        request for request in server.requests if request.user_agent == SERVER_SOFTWARE
+    ]
+
+
+def coordinators(hass):
+    """Return each station's coordinator in each language."""
+    integration = support.load_integration()
+    return [
+        integration.get_weather_data(hass, station, None, language)
+        for station in STATIONS
+        for language in support.LANGUAGES
+    ]
+
+
+async def async_refresh_all(hass, server):
+    """Refresh every station, then publish and refresh its alerts."""
+    for coordinator in coordinators(hass):
+        await coordinator.async_refresh()
+        await hass.async_block_till_done()
+        assert coordinator.last_update_success
+    for station in STATIONS:
+        server.publish(station=station, padding=PADDING)
+    for coordinator in coordinators(hass):
+        await coordinator.alerts.async_refresh()
+        assert coordinator.alerts.last_update_success
+        assert coordinator.alerts.data
+
+
+def test_session_is_shared():
+    """Every caller gets the same session, and each station one coordinator."""
+
+    async def test(hass, server):
+        assert session.async_get_session(hass) is session.async_get_session(hass)
+        assert coordinators(hass) == coordinators(hass)
+
+    asyncio.run(async_run(test))
+
+
+def test_sequential_requests_reuse_one_connection():
+    """Station lookups, refreshes and alert reads all share a connection."""
+
+    async def test(hass, server):
+        assert await stations.async_closest_station(hass, 45.4, -75.7) == STATIONS[0]
+        await async_refresh_all(hass, server)
+
+        requests = integration_requests(server)
+        assert {request.method for request in requests} == {"GET", "HEAD"}
+        assert any(request.path.endswith(".csv") for request in requests)
+        assert server.connections(SERVER_SOFTWARE) == 1
+
+    asyncio.run(async_run(test))
+
+
+def test_concurrent_requests_stay_within_the_pool():
+    """Refreshing every station at once opens no more than the pool's limit."""
+
+    async def test(hass, server):
+        for _ in range(3):
+            await asyncio.gather(
+                *(coordinator.async_refresh() for coordinator in coordinators(hass))
+            )
+            await hass.async_block_till_done()
+            for station in STATIONS:
+                server.publish(station=station, padding=PADDING)
+            await asyncio.gather(
+                *(
+                    coordinator.alerts.async_refresh()
+                    for coordinator in coordinators(hass)
+                )
+            )
+
+        assert len(integration_requests(server)) >= 3 * 2 * len(coordinators(hass))
+        assert (
+            1
+            <= server.connections(SERVER_SOFTWARE)
+            <= session.MAX_CONNECTIONS_PER_HOST
+        )
+
+    asyncio.run(async_run(test))
@@ -0,0 +1,68 @@
+"""Rolling timings and cache statistics for finding slow data sources."""
+from collections import deque
+from contextlib import contextmanager
+import math
+import time
+
+TIMING_SAMPLES = 100
+
+
+class Timings:
+    """Recent stage timings, payload sizes and cache hit rates for a source.
+
+    Each stage keeps its last few durations, so percentiles follow the
+    source's current behaviour rather than its whole history.
+    """
+
+    def __init__(self, samples=TIMING_SAMPLES):
+        """Initialize empty statistics."""
+        self._samples = samples
+        self._spans = {}
+        self._sizes = {}
+        self._hits = {}
+
+    @contextmanager
+    def span(self, stage):
+        """Time the enclosed block as one run of a stage."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def record(self, stage, seconds):
+        """Record how long a run of a stage took."""
+        if stage not in self._spans:
+            self._spans[stage] = deque(maxlen=self._samples)
+        self._spans[stage].append(seconds)
+
+    def size(self, payload, size):
+        """Record the latest size of a payload, in bytes."""
+        self._sizes[payload] = size
+
+    def hit(self, cache, hit):
+        """Record whether a cache lookup was a hit."""
+        hits, lookups = self._hits.get(cache, (0, 0))
+        self._hits[cache] = (hits + bool(hit), lookups + 1)
+
+    def percentile(self, stage, percent):
+        """Return a percentile of a stage's recent durations, in milliseconds."""
+        durations = sorted(self._spans.get(stage, ()))
+        if not durations:
+            return None
+        rank = max(0, math.ceil(percent / 100 * len(durations)) - 1)
+        return round(durations[rank] * 1000, 1)
+
+    def summary(self):
+        """Return every statistic as flat, attribute-friendly values."""
+        summary = {}
+        for stage, durations in self._spans.items():
+            summary[f"{stage}_p50_ms"] = self.percentile(stage, 50)
+            summary[f"{stage}_p95_ms"] = self.percentile(stage, 95)
+            summary[f"{stage}_max_ms"] = round(max(durations) * 1000, 1)
+            summary[f"{stage}_count"] = len(durations)
+        for payload, size in self._sizes.items():
+            summary[f"{payload}_bytes"] = size
+        for cache, (hits, lookups) in self._hits.items():
+            summary[f"{cache}_hit_rate"] = round(hits / lookups, 3)
+        return summary
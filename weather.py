@@ -1,48 +1,52 @@
 """Platform for retrieving meteorological data from Environment Canada."""
-import datetime
-import re
-
-from env_canada import ECWeather  # pylint: disable=import-error
 import voluptuous as vol
 
-from homeassistant.components.weather import (
-    ATTR_FORECAST_CONDITION,
-    ATTR_FORECAST_PRECIPITATION_PROBABILITY,
-    ATTR_FORECAST_TEMP,
-    ATTR_FORECAST_TEMP_LOW,
-    ATTR_FORECAST_TIME,
-    PLATFORM_SCHEMA,
-    WeatherEntity,
+from homeassistant.components.weather import PLATFORM_SCHEMA, WeatherEntity
+from homeassistant.const import (
+    CONF_LATITUDE,
+    CONF_LONGITUDE,
+    CONF_NAME,
+    CONF_PLATFORM,
+    CONF_UNIQUE_ID,
+    TEMP_CELSIUS,
 )
-from homeassistant.const import CONF_LATITUDE, CONF_LONGITUDE, CONF_NAME, TEMP_CELSIUS
+from homeassistant.core import callback
 import homeassistant.helpers.config_validation as cv
-import homeassistant.util.dt as dt
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
+from . import get_weather_data
 from .const import (
     ATTRIBUTION,
-    ICON_CONDITION_MAP
+    DOMAIN,
+    ICON_CODE_TO_CONDITION
 )
+from .forecast import MAX_FORECAST_DAYS, HourlyForecastStore, build_daily_forecast
+from .stations import async_closest_station, validate_station
 
-CONF_FORECAST = "forecast"
-CONF_STATION = "station"
+ATTR_STALE = "stale"
 
+CONF_FORECAST = "forecast"
+CONF_FORECAST_DAYS = "forecast_days"
+CONF_FORECAST_HOURS = "forecast_hours"
 
-def validate_station(station):
-    """Check that the station ID is well-formed."""
-    if station is None:
-        return
-    if not re.fullmatch(r"[A-Z]{2}/s0000\d{3}", station):
-        raise vol.error.Invalid('Station ID must be of the form "XX/s0000###"')
-    return station
+DEFAULT_FORECAST_DAYS = 6
+CONF_STATION = "station"
 
 
 PLATFORM_SCHEMA = PLATFORM_SCHEMA.extend(
     {
         vol.Optional(CONF_NAME): cv.string,
+        vol.Optional(CONF_UNIQUE_ID): cv.string,
         vol.Optional(CONF_STATION): validate_station,
         vol.Inclusive(CONF_LATITUDE, "latlon"): cv.latitude,
         vol.Inclusive(CONF_LONGITUDE, "latlon"): cv.longitude,
         vol.Optional(CONF_FORECAST, default="daily"): vol.In(["daily", "hourly"]),
+        vol.Optional(CONF_FORECAST_DAYS, default=DEFAULT_FORECAST_DAYS): vol.All(
+            vol.Coerce(int), vol.Range(min=1, max=MAX_FORECAST_DAYS)
+        ),
+        vol.Optional(CONF_FORECAST_HOURS): vol.All(
+            vol.Coerce(int), vol.Range(min=1)
+        ),
     }
 )
 
@@ -50,30 +54,57 @@ PLATFORM_SCHEMA = PLATFORM_SCHEMA.extend(
 
 async def async_setup_platform(hass, config, async_add_entities, discovery_info=None):
     """Set up the Environment Canada weather."""
-    if config.get(CONF_STATION):
-        ec_data = ECWeather(station_id=config[CONF_STATION])
-    else:
-        lat = config.get(CONF_LATITUDE, hass.config.latitude)
-        lon = config.get(CONF_LONGITUDE, hass.config.longitude)
-        ec_data = ECWeather(coordinates=(lat, lon))
-
-    async_add_entities([ECWeatherHA(ec_data, config)], True)
+    lat = config.get(CONF_LATITUDE, hass.config.latitude)
+    lon = config.get(CONF_LONGITUDE, hass.config.longitude)
+    station_id = config.get(CONF_STATION) or await async_closest_station(
+        hass, lat, lon
+    )
+    coordinator = get_weather_data(hass, station_id, (lat, lon))
+    await coordinator.async_first_refresh()
+
+    async_add_entities([ECWeatherHA(coordinator, config)])
+
+
+async def async_setup_entry(hass, entry, async_add_entities):
+    """Set up the Environment Canada weather from a config entry."""
+    config = PLATFORM_SCHEMA(
+        {
+            CONF_PLATFORM: DOMAIN,
+            CONF_UNIQUE_ID: f"{entry.unique_id}-weather",
+            CONF_STATION: entry.data[CONF_STATION],
+            CONF_LATITUDE: entry.data[CONF_LATITUDE],
+            CONF_LONGITUDE: entry.data[CONF_LONGITUDE],
+        }
+    )
+    await async_setup_platform(hass, config, async_add_entities)
 
 
-class ECWeatherHA(WeatherEntity):
+class ECWeatherHA(CoordinatorEntity, WeatherEntity):
     """Representation of a weather condition."""
 
-    def __init__(self, ec_data, config):
+    def __init__(self, coordinator, config):
         """Initialize Environment Canada weather."""
-        self.ec_data = ec_data
+        super().__init__(coordinator)
+        self.ec_data = coordinator.ec_data
         self.platform_name = config.get(CONF_NAME)
+        self._unique_id = config.get(CONF_UNIQUE_ID)
         self.forecast_type = config[CONF_FORECAST]
+        self.forecast_days = config[CONF_FORECAST_DAYS]
+        self.forecast_hours = config.get(CONF_FORECAST_HOURS)
+        self._forecast = None
+        self._hourly = HourlyForecastStore()
+        self._hourly_stale = True
 
     @property
     def attribution(self):
         """Return the attribution."""
         return ATTRIBUTION
 
+    @property
+    def unique_id(self):
+        """Return the unique ID, if one was configured."""
+        return self._unique_id
+
     @property
     def name(self):
         """Return the name of the weather entity."""
@@ -81,6 +112,11 @@ class ECWeatherHA(WeatherEntity):
             return self.platform_name
         return self.ec_data.metadata.get("location")
 
+    @property
+    def extra_state_attributes(self):
+        """Return whether the data is stale."""
+        return {ATTR_STALE: self.coordinator.stale}
+
     @property
     def temperature(self):
         """Return the temperature."""
@@ -147,91 +183,46 @@ class ECWeatherHA(WeatherEntity):
     @property
     def forecast(self):
         """Return the forecast array."""
-        return get_forecast(self.ec_data, self.forecast_type)
-
-    async def async_update(self):
-        """Get the latest data from Environment Canada."""
-        await self.ec_data.update()
-
-
-def get_forecast(ec_data, forecast_type):
+        timings = self.coordinator.timings
+        if self.forecast_type == "hourly":
+            timings.hit("forecast", not self._hourly_stale)
+            if self._hourly_stale:
+                with timings.span("forecast"):
+                    self._hourly.update(self.ec_data.hourly_forecasts)
+                self._hourly_stale = False
+            return self._hourly.window(self.forecast_hours)
+
+        cached = self._forecast is not None and self._forecast[0] == self.forecast_type
+        timings.hit("forecast", cached)
+        if not cached:
+            with timings.span("forecast"):
+                self._forecast = (
+                    self.forecast_type,
+                    get_forecast(self.ec_data, self.forecast_type, self.forecast_days),
+                )
+        return self._forecast[1]
+
+    @callback
+    def _handle_coordinator_update(self):
+        """Drop the cached forecast when new data arrives."""
+        self._forecast = None
+        self._hourly_stale = True
+        super()._handle_coordinator_update()
+
+
+def get_forecast(ec_data, forecast_type, days=DEFAULT_FORECAST_DAYS):
     """Build the forecast array."""
-    forecast_array = []
-
     if forecast_type == "daily":
-        half_days = ec_data.daily_forecasts
-
-        today = {
-            ATTR_FORECAST_TIME: dt.now().isoformat(),
-            ATTR_FORECAST_CONDITION: icon_code_to_condition(
-                int(half_days[0]["icon_code"])
-            ),
-            ATTR_FORECAST_PRECIPITATION_PROBABILITY: int(
-                half_days[0]["precip_probability"]
-            ),
-        }
+        return [
+            day.as_dict()
+            for day in build_daily_forecast(ec_data.daily_forecasts, days)
+        ]
 
-        if half_days[0]["temperature_class"] == "high":
-            today.update(
-                {
-                    ATTR_FORECAST_TEMP: int(half_days[0]["temperature"]),
-                    ATTR_FORECAST_TEMP_LOW: int(half_days[1]["temperature"]),
-                }
-            )
-            half_days = half_days[2:]
-        else:
-            today.update(
-                {
-                    ATTR_FORECAST_TEMP: None,
-                    ATTR_FORECAST_TEMP_LOW: int(half_days[0]["temperature"]),
-                }
-            )
-            half_days = half_days[1:]
-
-        forecast_array.append(today)
-
-        for day, high, low in zip(range(1, 6), range(0, 9, 2), range(1, 10, 2)):
-            forecast_array.append(
-                {
-                    ATTR_FORECAST_TIME: (
-                        dt.now() + datetime.timedelta(days=day)
-                    ).isoformat(),
-                    ATTR_FORECAST_TEMP: int(half_days[high]["temperature"]),
-                    ATTR_FORECAST_TEMP_LOW: int(half_days[low]["temperature"]),
-                    ATTR_FORECAST_CONDITION: icon_code_to_condition(
-                        int(half_days[high]["icon_code"])
-                    ),
-                    ATTR_FORECAST_PRECIPITATION_PROBABILITY: int(
-                        half_days[high]["precip_probability"]
-                    ),
-                }
-            )
-
-    elif forecast_type == "hourly":
-        for hour in ec_data.hourly_forecasts:
-            forecast_array.append(
-                {
-                    ATTR_FORECAST_TIME: datetime.datetime.strptime(
-                        hour["period"], "%Y%m%d%H%M"
-                    )
-                    .replace(tzinfo=dt.UTC)
-                    .isoformat(),
-                    ATTR_FORECAST_TEMP: int(hour["temperature"]),
-                    ATTR_FORECAST_CONDITION: icon_code_to_condition(
-                        int(hour["icon_code"])
-                    ),
-                    ATTR_FORECAST_PRECIPITATION_PROBABILITY: int(
-                        hour["precip_probability"]
-                    ),
-                }
-            )
-
-    return forecast_array
+    hourly = HourlyForecastStore()
+    hourly.update(ec_data.hourly_forecasts)
+    return hourly.window()
 
 
 def icon_code_to_condition(icon_code):
     """Return the condition corresponding to an icon code."""
-    for condition, codes in ICON_CONDITION_MAP.items():
-        if icon_code in codes:
-            return condition
-    return None
+    return ICON_CODE_TO_CONDITION.get(icon_code)